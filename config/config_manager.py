@@ -18,6 +18,12 @@ class ConfigManager:
         else:
             return os.path.dirname(os.path.abspath(__file__))
 
+    def obtener_ruta_datos(self, nombre: str) -> str:
+        """Ruta dentro de la carpeta 'cache' junto a la configuración (se crea si no existe)."""
+        carpeta = os.path.join(self.base_path, 'cache')
+        os.makedirs(carpeta, exist_ok=True)
+        return os.path.join(carpeta, nombre)
+
     def cargar_configuracion(self) -> Optional[str]:
         if os.path.exists(self.config_path):
             try:
@@ -2,3 +2,96 @@
 
 APP_VERSION = "1.5.3"
 APP_NAME = "Descargador de YouTube 🎬"
+
+# Caché persistente de metadatos (iTunes / Deezer / LRCLIB)
+CACHE_TTL_SEGUNDOS = 30 * 24 * 3600        # Respuestas con resultado: 30 días
+CACHE_TTL_NEGATIVO_SEGUNDOS = 3 * 24 * 3600  # "Sin resultado": 3 días
+CACHE_MAX_ENTRADAS = 50000                  # Límite antes de desalojar las menos usadas
+
+# Cliente HTTP compartido (keep-alive)
+HTTP_POOL_HOSTS = 10          # Pools por host que se mantienen abiertos
+HTTP_POOL_MAXIMO = 16         # Conexiones reutilizables por host
+HTTP_TIMEOUT_CONEXION = 3.05  # Segundos para establecer la conexión
+HTTP_TIMEOUT_LECTURA = 5      # Segundos esperando respuesta
+
+# Etiquetado
+METADATA_CONCURRENCIA = 4  # Archivos etiquetándose a la vez en el loop compartido (= hilos de la etapa 'etiquetar')
+METADATA_BUSQUEDA_CONCURRENTE = True  # iTunes y Deezer en paralelo, estrategias escalonadas (False = secuencial)
+METADATA_VENTANA_CARRERA = 0.35       # Segundos extra esperando un candidato de mayor prioridad
+METADATA_ESCALON_CARRERA = 1.0        # Segundos sin respuesta antes de lanzar la siguiente estrategia
+ALBUM_BUSCAR_LETRAS = False  # En modo álbum, consultar LRCLIB por pista (una petición extra por canción)
+ALBUM_TOLERANCIA_DURACION = 10  # Segundos de diferencia aceptados al emparejar pistas del álbum
+
+# Caché de portadas
+COVER_MAX_LADO = 600          # Lado máximo (px) de la portada incrustada
+COVER_CALIDAD_JPEG = 90       # Calidad JPEG al re-codificar
+COVER_MAX_ARCHIVOS = 2000     # Portadas procesadas que se conservan en disco
+COVER_CACHE_MEMORIA = 32      # Portadas que se mantienen en memoria (lotes del mismo álbum)
+
+# Reconocimiento Shazam
+SHAZAM_MODO_FRAGMENTO = True       # Reconocer desde un fragmento decodificado en lugar del archivo completo
+SHAZAM_DURACION_VENTANA = 12       # Segundos por fragmento
+SHAZAM_VENTANAS = (0.30, 0.60)     # Posición (fracción de la duración) de cada intento
+SHAZAM_PROCESOS_DECODIFICACION = 2 # Procesos dedicados a decodificar con ffmpeg
+
+# Ruta rápida con metadatos de yt-dlp (subidas "Artista - Topic" de YouTube Music)
+YTDLP_RUTA_RAPIDA = True    # Etiquetar sin Shazam cuando yt-dlp trae metadatos oficiales
+YTDLP_BUSCAR_LETRAS = False # En la ruta rápida, consultar también LRCLIB (una petición por pista)
+
+# Límites por proveedor de metadatos
+# tasa: peticiones/segundo sostenidas | rafaga: tamaño del cubo de tokens
+# reintentos: ante 429/5xx (con backoff) | umbral_fallos/enfriamiento: circuit breaker (segundos)
+PROVEEDORES = {
+    'itunes': {'tasa': 0.33, 'rafaga': 20, 'reintentos': 2, 'umbral_fallos': 3, 'enfriamiento': 60},
+    'deezer': {'tasa': 8, 'rafaga': 40, 'reintentos': 2, 'umbral_fallos': 3, 'enfriamiento': 60},
+    'lrclib': {'tasa': 5, 'rafaga': 10, 'reintentos': 1, 'umbral_fallos': 3, 'enfriamiento': 120},
+    'shazam': {'tasa': 1, 'rafaga': 3, 'reintentos': 2, 'umbral_fallos': 4, 'enfriamiento': 90},
+}
+METADATA_CANDIDATOS = 5        # Resultados por búsqueda (se puntúan todos en vez de aceptar el primero)
+METADATA_UMBRAL_COINCIDENCIA = 0.5  # Puntuación mínima para aceptar un candidato
+METADATA_UMBRAL_ARTISTA = 0.5       # Similitud mínima de artista cuando se conoce (si no, otra canción)
+
+# Escritura de tags
+TAGS_PADDING = 64 * 1024  # Bytes reservados tras los tags para que re-etiquetar no reescriba todo el audio
+
+# Caché de info de yt-dlp (evita extraer dos veces: sondeo de calidades + descarga)
+INFO_CACHE_MAX_ENTRADAS = 32      # Info dicts de video que se conservan en memoria
+INFO_CACHE_TTL_SEGUNDOS = 1800    # Vigencia si las URLs firmadas no declaran 'expire'
+INFO_CACHE_MARGEN_SEGUNDOS = 600  # Se descarta antes de que caduquen las URLs firmadas
+
+# Análisis de playlists
+PLAYLIST_TAM_BLOQUE = 50  # Items que se entregan a la UI por bloque durante el análisis incremental
+PLAYLIST_CACHE_TTL_SEGUNDOS = 30 * 24 * 3600  # Cuánto se conserva en disco una playlist analizada
+PLAYLIST_CACHE_FRESCO_SEGUNDOS = 3600         # Mientras sea más reciente se muestra sin consultar a YouTube
+
+# Conversión de audio
+# Calidad MP3 para FFmpegExtractAudio: '0'-'9' = VBR (-q:a, 0 es la mejor), valores mayores = kbps CBR.
+# La fuente de YouTube ronda 128-160 kbps (Opus/AAC), así que V2 (~190 kbps) ya es transparente.
+MP3_CALIDAD = '2'
+OPUS_BITRATE = '160k'    # Solo si hay que recodificar a Opus (la fuente no es Opus)
+TRANSCODE_PROCESOS = None  # ffmpeg simultáneos en lotes; None = número de núcleos
+
+# Lotes retomables
+LOTES_TERMINADOS_TTL_SEGUNDOS = 30 * 24 * 3600  # Registro de lotes terminados (sus items se borran al cerrar)
+
+# Pipeline de lotes (extraer -> descargar -> convertir -> etiquetar)
+# hilos: concurrencia de la etapa (None en 'convertir' = número de núcleos,
+#        None en 'descargar' = la adaptativa de CONCURRENCIA_DESCARGAS,
+#        None en 'etiquetar' = METADATA_CONCURRENCIA)
+# cola: trabajos que pueden esperar a la etapa antes de bloquear a la anterior (backpressure)
+PIPELINE_ETAPAS = {
+    'extraer': {'hilos': 2, 'cola': 4},
+    'descargar': {'hilos': None, 'cola': 4},
+    'convertir': {'hilos': None, 'cola': 4},
+    'etiquetar': {'hilos': None, 'cola': 16},
+}
+
+# Descargas simultáneas adaptativas (AIMD): sube mientras mejora el throughput, baja a la mitad ante 403/429
+CONCURRENCIA_DESCARGAS = {'minimo': 1, 'inicial': 2, 'maximo': 6}
+
+# Progreso de lotes
+PROGRESO_FRECUENCIA_HZ = 15  # Máximo de actualizaciones por segundo hacia la UI
+
+# Consenso de artista en playlists
+CONSENSO_PROPORCION = 0.6   # Fracción de pistas con el mismo artista para considerarlo el de la playlist
+CONSENSO_MIN_PISTAS = 5     # Pistas etiquetadas antes de aplicar el consenso a las siguientes
@@ -4,7 +4,12 @@ from typing import Optional, Callable
 from config.config_manager import ConfigManager
 from services.youtube_service import YouTubeService
 from services.metadata_service import MetadataService
+from services.cache_service import CacheService
+from services.cover_cache import CoverArtCache
 from services.playlist_service import PlaylistService
+from services.transcode_service import TranscodeService
+from services.job_store import JobStore
+from services.library_index import LibraryIndex
 
 class AppController:
     """
@@ -14,9 +19,16 @@ class AppController:
     
     def __init__(self):
         self.config_manager = ConfigManager()
-        self.youtube_service = YouTubeService(self.config_manager)
-        self.metadata_service = MetadataService()
-        self.playlist_service = PlaylistService(self.youtube_service, self.metadata_service)
+        self.metadata_cache = CacheService(self.config_manager.obtener_ruta_datos('metadata_cache.db'))
+        self.youtube_service = YouTubeService(self.config_manager, cache=self.metadata_cache)
+        self.portadas = CoverArtCache(self.config_manager.obtener_ruta_datos('portadas'), indice=self.metadata_cache)
+        self.metadata_service = MetadataService(cache=self.metadata_cache, portadas=self.portadas)
+        self.transcode_service = TranscodeService()
+        self.job_store = JobStore(self.config_manager.obtener_ruta_datos('lotes.db'))
+        self.library_index = LibraryIndex(self.config_manager.obtener_ruta_datos('biblioteca.db'))
+        self.playlist_service = PlaylistService(self.youtube_service, self.metadata_service,
+                                                transcode_service=self.transcode_service,
+                                                job_store=self.job_store, library_index=self.library_index)
         
         self.video_data_cache = None
 
@@ -36,6 +48,22 @@ class AppController:
             self.video_data_cache = data
         return data, err
 
+    def analyze_url_streaming(self, url: str, on_inicio: Callable = None, on_items: Callable = None,
+                              cancelado: Callable = None, refrescar: bool = False,
+                              on_quitados: Callable = None) -> tuple:
+        """
+        Igual que analyze_url pero entregando la playlist por bloques.
+        video_data_cache apunta a los datos desde on_inicio, así se puede descargar
+        lo ya listado mientras sigue la enumeración.
+        """
+        def inicio(data):
+            self.video_data_cache = data
+            if on_inicio: on_inicio(data)
+
+        return self.youtube_service.obtener_info_streaming(url, on_inicio=inicio, on_items=on_items,
+                                                           cancelado=cancelado, refrescar=refrescar,
+                                                           on_quitados=on_quitados)
+
     def start_download_thread(self, url: str, path: str, is_video: bool, 
                               audio_fmt: str, video_fmt: str, 
                               playlist_indices: Optional[list] = None,
@@ -82,6 +110,39 @@ class AppController:
 
         threading.Thread(target=run, daemon=True).start()
 
+    def get_pending_batches(self) -> list:
+        """Lotes que quedaron a medias (cierre o caída de la app)."""
+        return self.job_store.lotes_pendientes()
+
+    def discard_batch(self, lote_id: str):
+        self.job_store.descartar_lote(lote_id)
+
+    def resume_batch(self, lote: dict, progress_callback: Callable = None,
+                     status_callback: Callable = None, finished_callback: Callable = None,
+                     stats_callback: Callable = None):
+        """Relanza un lote pendiente con sus parámetros originales; lo ya completado se salta."""
+        def run():
+            try:
+                fallidos = self.playlist_service.procesar_batch(
+                    url=lote['url'], items=lote['items'], progress_callback=progress_callback,
+                    status_callback=status_callback, stats_callback=stats_callback, **lote['parametros']
+                )
+                if finished_callback: finished_callback(True, self._mensaje_lote("Descarga reanudada completada", fallidos))
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+                if finished_callback: finished_callback(False, str(e))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    @staticmethod
+    def _mensaje_lote(mensaje: str, fallidos: list) -> str:
+        if not fallidos: return mensaje
+        lineas = [f"{mensaje}, pero {len(fallidos)} no se pudieron descargar:"]
+        lineas += [f"• {f['title']} ({f['motivo'] or 'error'})" for f in fallidos[:10]]
+        if len(fallidos) > 10: lineas.append(f"... y {len(fallidos) - 10} más")
+        return "\n".join(lineas)
+
     def get_video_qualities(self, url: str, video_fmt: str):
         return self.youtube_service.obtener_calidades_disponibles(url, video_fmt)
 
@@ -91,19 +152,25 @@ class AppController:
                        playlist_indices: Optional[list] = None,
                        progress_callback: Callable = None, 
                        status_callback: Callable = None,
-                       finished_callback: Callable = None):
+                       finished_callback: Callable = None,
+                       sincronizar: bool = False,
+                       stats_callback: Callable = None):
         
         def run():
             try:
+                fallidos = []
                 if playlist_indices and self.video_data_cache:
                      items = self.video_data_cache.get('playlist_items', [])
                      selected_items = [items[i] for i in playlist_indices if i < len(items)]
                      
-                     self.playlist_service.procesar_batch(
+                     fallidos = self.playlist_service.procesar_batch(
                         url=url, items=selected_items, tipo='video' if is_video else 'musica',
                         formato_id=formato_id, audio_format=audio_fmt, directorio=path,
                         contenedor=video_fmt, progress_callback=progress_callback,
-                        status_callback=status_callback
+                        status_callback=status_callback,
+                        playlist_title=self.video_data_cache.get('title'),
+                        playlist_uploader=self.video_data_cache.get('uploader'),
+                        sincronizar=sincronizar, stats_callback=stats_callback
                     )
                 else:
                     tipo = 'video' if is_video else 'musica'
@@ -118,9 +185,16 @@ class AppController:
                     if tipo == 'musica' and res:
                         if status_callback: status_callback("Etiquetando...")
                         artist_hint = info.get('uploader') or info.get('artist')
-                        self.metadata_service.etiquetar(res, artista_hint=artist_hint, status_callback=status_callback)
+                        etiquetado = self.metadata_service.etiquetar(res, artista_hint=artist_hint, status_callback=status_callback,
+                                                                     video_id=info.get('id'),
+                                                                     datos_previos=self.metadata_service.datos_desde_ytdlp(info))
+                        if etiquetado:
+                            res = etiquetado.get('file_path', res)
+                        self.library_index.registrar(info.get('id'), audio_fmt, res, etiquetado)
+                    elif res:
+                        self.library_index.registrar(info.get('id'), video_fmt, res)
 
-                if finished_callback: finished_callback(True, "Finalizado")
+                if finished_callback: finished_callback(True, self._mensaje_lote("Finalizado", fallidos))
 
             except Exception as e:
                 import traceback
@@ -1,5 +1,8 @@
+import multiprocessing
 from ui.main_window import MainWindow
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos de decodificación en el ejecutable congelado
+    multiprocessing.freeze_support()
     app = MainWindow()
     app.mainloop()
@@ -0,0 +1,130 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+from config.settings import CACHE_TTL_SEGUNDOS, CACHE_TTL_NEGATIVO_SEGUNDOS, CACHE_MAX_ENTRADAS
+
+
+class CacheService:
+    """
+    Caché persistente (SQLite) de respuestas de proveedores externos, con TTL y caché negativo.
+    Las lecturas no escriben en disco: la fecha de último acceso (para el desalojo LRU) se
+    acumula en memoria y se vuelca junto con el desalojo.
+    """
+
+    MAX_ACCESOS_PENDIENTES = 1000  # Si solo hay lecturas, se vuelcan al llegar a tantas
+
+    def __init__(self, ruta_db: str, ttl: int = CACHE_TTL_SEGUNDOS,
+                 ttl_negativo: int = CACHE_TTL_NEGATIVO_SEGUNDOS, max_entradas: int = CACHE_MAX_ENTRADAS):
+        self.ruta_db = ruta_db
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self.max_entradas = max_entradas
+
+        self._lock = threading.Lock()
+        self._escrituras = 0
+        self._accesos = {}  # (proveedor, clave) -> último acceso aún no guardado
+        self._conn = sqlite3.connect(ruta_db, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                proveedor TEXT NOT NULL,
+                clave TEXT NOT NULL,
+                valor TEXT,
+                expira REAL NOT NULL,
+                accedido REAL NOT NULL,
+                PRIMARY KEY (proveedor, clave)
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accedido ON cache(accedido)")
+        self._conn.commit()
+
+    @staticmethod
+    def _normalizar_texto(texto: Any) -> str:
+        return re.sub(r'\s+', ' ', str(texto)).strip().lower()
+
+    @classmethod
+    def normalizar_clave(cls, consulta: Any) -> str:
+        """
+        Clave de caché. En un dict de parámetros de búsqueda los valores (texto libre) se normalizan
+        para que variaciones triviales compartan entrada; la URL ('_url') y las claves de texto
+        (IDs de video o playlist, URLs de portada) se guardan tal cual porque distinguen mayúsculas.
+        """
+        if isinstance(consulta, dict):
+            return "&".join(f"{k}={consulta[k] if k == '_url' else cls._normalizar_texto(consulta[k])}"
+                            for k in sorted(consulta) if consulta[k] is not None)
+        return str(consulta)
+
+    def obtener(self, proveedor: str, consulta: Any) -> Tuple[bool, Any]:
+        """Retorna (encontrado, valor). Un valor None con encontrado=True es un 'sin resultado' cacheado."""
+        clave = self.normalizar_clave(consulta)
+        ahora = time.time()
+        try:
+            with self._lock:
+                fila = self._conn.execute(
+                    "SELECT valor, expira FROM cache WHERE proveedor = ? AND clave = ?", (proveedor, clave)
+                ).fetchone()
+                if not fila:
+                    return False, None
+                valor, expira = fila
+                if expira < ahora:
+                    return False, None  # Lo borra el próximo desalojo
+                self._accesos[(proveedor, clave)] = ahora
+                if len(self._accesos) >= self.MAX_ACCESOS_PENDIENTES:
+                    self._volcar_accesos()
+                    self._conn.commit()
+            return True, (json.loads(valor) if valor is not None else None)
+        except Exception as e:
+            print(f"⚠️ Error leyendo caché ({proveedor}): {e}")
+            return False, None
+
+    def guardar(self, proveedor: str, consulta: Any, valor: Any, ttl: Optional[int] = None) -> None:
+        """Guarda un valor. Si valor es None se registra como 'sin resultado' con el TTL negativo."""
+        clave = self.normalizar_clave(consulta)
+        if ttl is None:
+            ttl = self.ttl_negativo if valor is None else self.ttl
+        ahora = time.time()
+        try:
+            datos = json.dumps(valor) if valor is not None else None
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (proveedor, clave, valor, expira, accedido) VALUES (?, ?, ?, ?, ?)",
+                    (proveedor, clave, datos, ahora + ttl, ahora)
+                )
+                self._conn.commit()
+                self._escrituras += 1
+                if self._escrituras % 100 == 0:
+                    self._desalojar(ahora)
+        except Exception as e:
+            print(f"⚠️ Error guardando caché ({proveedor}): {e}")
+
+    def _volcar_accesos(self) -> None:
+        if not self._accesos: return
+        self._conn.executemany(
+            "UPDATE cache SET accedido = ? WHERE proveedor = ? AND clave = ? AND accedido < ?",
+            [(t, proveedor, clave, t) for (proveedor, clave), t in self._accesos.items()]
+        )
+        self._accesos.clear()
+
+    def _desalojar(self, ahora: float) -> None:
+        """Elimina expirados y, si se supera el límite, las entradas menos usadas recientemente."""
+        self._volcar_accesos()
+        self._conn.execute("DELETE FROM cache WHERE expira < ?", (ahora,))
+        total = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        exceso = total - self.max_entradas
+        if exceso > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY accedido ASC LIMIT ?)", (exceso,)
+            )
+        self._conn.commit()
+
+    def limpiar(self, proveedor: Optional[str] = None) -> None:
+        with self._lock:
+            if proveedor:
+                self._conn.execute("DELETE FROM cache WHERE proveedor = ?", (proveedor,))
+            else:
+                self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
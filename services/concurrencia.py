@@ -0,0 +1,120 @@
+import threading
+import time
+
+
+class ControlConcurrencia:
+    """
+    Concurrencia adaptativa (AIMD) para las descargas de un lote.
+    Los hilos piden un cupo con adquirir() y lo devuelven con liberar(); el límite de cupos
+    sube de a uno mientras el throughput agregado mejora y los éxitos se mantienen, y se
+    reduce a la mitad ante 403/429 o si el throughput se desploma.
+    Los 403/429 suelen llegar en ráfaga (todas las descargas en curso a la vez): tras una
+    reducción, las señales siguientes se ignoran hasta que terminen las descargas que ya
+    estaban en curso, así una misma ráfaga cuenta como una sola reducción.
+    """
+
+    def __init__(self, minimo: int = 1, maximo: int = 8, inicial: int = 2,
+                 tasa_exito_minima: float = 0.8, factor_mejora: float = 1.05, factor_colapso: float = 0.5,
+                 ventanas_sondeo: int = 3):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.limite = min(max(inicial, self.minimo), self.maximo)
+        self.tasa_exito_minima = tasa_exito_minima
+        self.factor_mejora = factor_mejora
+        self.factor_colapso = factor_colapso
+        self.ventanas_sondeo = ventanas_sondeo
+
+        self.activos = 0
+        self.exitos = 0
+        self.fallos = 0
+        self.limitaciones = 0
+        self.throughput = 0.0  # bytes/s de la última ventana evaluada
+
+        self._cond = threading.Condition()
+        self._anterior = None
+        self._estables = 0
+        self._en_curso_al_reducir = 0  # Descargas previas a la última reducción que aún no terminaron
+        self._reiniciar_ventana()
+
+    def _reiniciar_ventana(self) -> None:
+        self._ventana_inicio = time.monotonic()
+        self._ventana_bytes = 0
+        self._ventana_n = 0
+        self._ventana_fallos = 0
+
+    def adquirir(self) -> None:
+        with self._cond:
+            while self.activos >= self.limite:
+                self._cond.wait()
+            self.activos += 1
+
+    def liberar(self, exito: bool, bytes_descargados: int = 0, limitado: bool = False) -> None:
+        with self._cond:
+            self.activos -= 1
+            if exito: self.exitos += 1
+            else: self.fallos += 1
+
+            # Empezó antes de la última reducción: su señal pertenece a esa misma ráfaga
+            previa = self._en_curso_al_reducir > 0
+            if previa: self._en_curso_al_reducir -= 1
+
+            if limitado:
+                self.limitaciones += 1
+                if not previa: self._reducir("limitado por el servidor (403/429)")
+            else:
+                self._ventana_n += 1
+                self._ventana_bytes += bytes_descargados
+                if not exito: self._ventana_fallos += 1
+                # Una ventana = tantas descargas terminadas como el límite actual
+                if self._ventana_n >= self.limite:
+                    self._evaluar()
+            self._cond.notify_all()
+
+    def registrar_limitacion(self) -> None:
+        """Un 403/429 fuera de una descarga (p.ej. al extraer) también cuenta como señal de freno."""
+        with self._cond:
+            self.limitaciones += 1
+            self._reducir("limitado por el servidor (403/429)")
+            self._cond.notify_all()
+
+    def _evaluar(self) -> None:
+        duracion = max(time.monotonic() - self._ventana_inicio, 1e-3)
+        throughput = self._ventana_bytes / duracion
+        tasa_exito = 1 - self._ventana_fallos / self._ventana_n
+        anterior = self._anterior
+        self.throughput = throughput
+
+        if tasa_exito < self.tasa_exito_minima:
+            self._reducir(f"tasa de éxito {tasa_exito:.0%}")
+            return
+        if anterior and throughput < anterior * self.factor_colapso:
+            self._reducir("caída de throughput")
+            return
+
+        if anterior is None or throughput >= anterior * self.factor_mejora:
+            self._aumentar()
+        else:
+            # Meseta: se mantiene, pero cada tantas ventanas se sondea un nivel más
+            self._estables += 1
+            if self._estables >= self.ventanas_sondeo:
+                self._aumentar()
+        self._anterior = throughput
+        self._reiniciar_ventana()
+
+    def _aumentar(self) -> None:
+        self._estables = 0
+        if self.limite < self.maximo:
+            self.limite += 1
+            print(f"📈 Descargas simultáneas: {self.limite}")
+
+    def _reducir(self, motivo: str) -> None:
+        self._estables = 0
+        self._anterior = None
+        self._reiniciar_ventana()
+        if self._en_curso_al_reducir:
+            return  # Todavía en la ráfaga de la reducción anterior
+        nuevo = max(self.minimo, self.limite // 2)
+        if nuevo < self.limite:
+            self.limite = nuevo
+            print(f"📉 Descargas simultáneas: {self.limite} ({motivo})")
+        self._en_curso_al_reducir = self.activos
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image
+
+from config.settings import COVER_MAX_LADO, COVER_CALIDAD_JPEG, COVER_MAX_ARCHIVOS, COVER_CACHE_MEMORIA
+from services.cache_service import CacheService
+from services.http_client import HttpClient
+
+
+class CoverArtCache:
+    """
+    Caché de portadas direccionada por contenido: cada imagen se descarga, se reduce y se
+    re-codifica a JPEG UNA vez, y esos bytes se reutilizan en todas las pistas que la comparten.
+    """
+
+    def __init__(self, carpeta: Optional[str] = None, indice: Optional[CacheService] = None,
+                 http: Optional[HttpClient] = None, max_lado: int = COVER_MAX_LADO,
+                 calidad_jpeg: int = COVER_CALIDAD_JPEG):
+        self.carpeta = carpeta
+        self.indice = indice  # url -> hash del contenido (persistente)
+        self.http = http or HttpClient.compartido()
+        self.max_lado = max_lado
+        self.calidad_jpeg = calidad_jpeg
+
+        self._memoria = OrderedDict()  # url -> bytes procesados
+        self._lock = threading.Lock()
+        self._locks_url = {}
+
+        if self.carpeta:
+            os.makedirs(self.carpeta, exist_ok=True)
+            self._podar_disco()
+
+    def obtener(self, url: str) -> Optional[bytes]:
+        """Retorna los bytes JPEG listos para incrustar, o None si la portada no está disponible."""
+        if not url: return None
+
+        with self._lock:
+            if url in self._memoria:
+                self._memoria.move_to_end(url)
+                return self._memoria[url]
+            lock_url = self._locks_url.setdefault(url, threading.Lock())
+
+        # Un solo hilo descarga/procesa cada URL; el resto espera y reutiliza
+        with lock_url:
+            with self._lock:
+                if url in self._memoria:
+                    return self._memoria[url]
+
+            datos = self._leer_de_disco(url)
+            if datos is None:
+                datos = self._descargar_y_procesar(url)
+
+            if datos:
+                with self._lock:
+                    self._memoria[url] = datos
+                    while len(self._memoria) > COVER_CACHE_MEMORIA:
+                        self._memoria.popitem(last=False)
+            with self._lock:
+                self._locks_url.pop(url, None)
+            return datos
+
+    def _ruta(self, digest: str) -> str:
+        return os.path.join(self.carpeta, f"{digest}.jpg")
+
+    def _leer_de_disco(self, url: str) -> Optional[bytes]:
+        if not (self.carpeta and self.indice): return None
+        encontrado, digest = self.indice.obtener('portada', url)
+        if not encontrado or not digest: return None
+        try:
+            with open(self._ruta(digest), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _descargar_y_procesar(self, url: str) -> Optional[bytes]:
+        try:
+            original = self.http.obtener_bytes(url)
+        except Exception as e:
+            print(f"⚠️ Error descargando portada: {e}")
+            return None
+        if not original: return None
+
+        # El hash es del contenido original: URLs distintas con la misma imagen comparten archivo
+        digest = hashlib.sha1(original).hexdigest()
+        if self.carpeta and os.path.exists(self._ruta(digest)):
+            with open(self._ruta(digest), 'rb') as f:
+                datos = f.read()
+        else:
+            datos = self._reducir(original)
+            if self.carpeta:
+                try:
+                    temporal = self._ruta(digest) + ".tmp"
+                    with open(temporal, 'wb') as f:
+                        f.write(datos)
+                    os.replace(temporal, self._ruta(digest))
+                except OSError as e:
+                    print(f"⚠️ No se pudo guardar la portada en caché: {e}")
+
+        if self.indice: self.indice.guardar('portada', url, digest)
+        return datos
+
+    def _reducir(self, original: bytes) -> bytes:
+        """Reduce al lado máximo y re-codifica a JPEG. Si falla o no mejora, conserva el original."""
+        try:
+            img = Image.open(BytesIO(original))
+            era_jpeg = img.format == 'JPEG'
+            recortada = False
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            if self._es_miniatura_youtube(img):
+                # Miniatura 16:9 de YouTube con el arte del álbum al centro: recorte cuadrado
+                ancho, alto = img.size
+                margen = (ancho - alto) // 2
+                img = img.crop((margen, 0, margen + alto, alto))
+                recortada = True
+            if max(img.size) > self.max_lado:
+                img.thumbnail((self.max_lado, self.max_lado), Image.LANCZOS)
+            salida = BytesIO()
+            img.save(salida, format='JPEG', quality=self.calidad_jpeg, optimize=True)
+            datos = salida.getvalue()
+            if era_jpeg and not recortada and len(datos) >= len(original):
+                return original
+            return datos
+        except Exception as e:
+            print(f"⚠️ No se pudo procesar la portada (se usa tal cual): {e}")
+            return original
+
+    @staticmethod
+    def _es_miniatura_youtube(img) -> bool:
+        ancho, alto = img.size
+        return alto > 0 and abs(ancho / alto - 16 / 9) < 0.05
+
+    def _podar_disco(self) -> None:
+        try:
+            archivos = [os.path.join(self.carpeta, n) for n in os.listdir(self.carpeta) if n.endswith('.jpg')]
+            exceso = len(archivos) - COVER_MAX_ARCHIVOS
+            if exceso > 0:
+                archivos.sort(key=os.path.getmtime)
+                for ruta in archivos[:exceso]:
+                    os.remove(ruta)
+        except OSError:
+            pass
@@ -0,0 +1,62 @@
+import threading
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.settings import (APP_VERSION, HTTP_POOL_HOSTS, HTTP_POOL_MAXIMO,
+                             HTTP_TIMEOUT_CONEXION, HTTP_TIMEOUT_LECTURA)
+
+
+class HttpClient:
+    """Sesión HTTP compartida: pools keep-alive por host y timeouts de conexión/lectura consistentes."""
+
+    _compartido = None
+    _lock_compartido = threading.Lock()
+
+    def __init__(self, pool_hosts: int = HTTP_POOL_HOSTS, pool_maximo: int = HTTP_POOL_MAXIMO,
+                 timeout: Tuple[float, float] = (HTTP_TIMEOUT_CONEXION, HTTP_TIMEOUT_LECTURA)):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = f"MusicaDownloader/{APP_VERSION}"
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_maximo)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def compartido(cls) -> 'HttpClient':
+        """Instancia única usada por servicios y UI para reutilizar conexiones entre sí."""
+        if cls._compartido is None:
+            with cls._lock_compartido:
+                if cls._compartido is None:
+                    cls._compartido = cls()
+        return cls._compartido
+
+    def get(self, url: str, params: dict = None, timeout=None, **kwargs) -> requests.Response:
+        return self.session.get(url, params=params, timeout=timeout or self.timeout, **kwargs)
+
+    def obtener_bytes(self, url: str, timeout=None) -> Optional[bytes]:
+        """Descarga el contenido (imágenes, portadas). Retorna None si la respuesta no es 200."""
+        resp = self.get(url, timeout=timeout)
+        if resp.status_code == 200:
+            return resp.content
+        return None
+
+    @staticmethod
+    def debe_reintentar(resp: requests.Response) -> bool:
+        return resp.status_code == 429 or resp.status_code >= 500
+
+    @staticmethod
+    def es_error_transitorio(error: Exception) -> bool:
+        # Conexión rechazada/reseteada sí; un timeout no (reintentarlo solo alarga una caída)
+        return isinstance(error, requests.ConnectionError) and not isinstance(error, requests.Timeout)
+
+    @staticmethod
+    def retry_after(resp: requests.Response) -> Optional[float]:
+        try:
+            return min(60.0, float(resp.headers.get('Retry-After')))
+        except (TypeError, ValueError):
+            return None
+
+    def cerrar(self) -> None:
+        self.session.close()
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import LOTES_TERMINADOS_TTL_SEGUNDOS
+
+
+class JobStore:
+    """
+    Registro persistente (SQLite) de los lotes de descarga y del estado de cada item,
+    para retomar un lote interrumpido (cierre o caída de la app) donde quedó.
+    Estados: en_cola -> descargado -> convertido -> etiquetado, o fallido (con motivo).
+    Un item que falla MAX_INTENTOS veces (video privado, borrado...) se da por perdido: no impide
+    cerrar el lote ni se vuelve a intentar al retomarlo.
+    """
+
+    EN_COLA = 'en_cola'
+    DESCARGADO = 'descargado'
+    CONVERTIDO = 'convertido'
+    ETIQUETADO = 'etiquetado'
+    FALLIDO = 'fallido'
+    MAX_INTENTOS = 2  # La ejecución original + un reintento al retomar
+
+    # Claves del info de yt-dlp que no hacen falta para convertir/etiquetar (y pesan mucho)
+    _INFO_DESCARTABLE = {'formats', 'requested_formats', 'requested_downloads', 'automatic_captions',
+                         'subtitles', 'heatmap', 'http_headers', 'fragments', 'storyboards'}
+
+    def __init__(self, ruta_db: str, ttl_terminados: int = LOTES_TERMINADOS_TTL_SEGUNDOS):
+        self.ruta_db = ruta_db
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta_db, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS lotes (
+                id TEXT PRIMARY KEY,
+                url TEXT,
+                parametros TEXT NOT NULL,
+                terminado INTEGER NOT NULL DEFAULT 0,
+                creado REAL NOT NULL,
+                actualizado REAL NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS trabajos (
+                lote_id TEXT NOT NULL,
+                indice INTEGER NOT NULL,
+                item TEXT NOT NULL,
+                estado TEXT NOT NULL,
+                ruta TEXT,
+                info TEXT,
+                resultado TEXT,
+                motivo TEXT,
+                intentos INTEGER NOT NULL DEFAULT 0,
+                actualizado REAL NOT NULL,
+                PRIMARY KEY (lote_id, indice)
+            )""")
+        columnas = {fila[1] for fila in self._conn.execute("PRAGMA table_info(trabajos)")}
+        if 'intentos' not in columnas:
+            self._conn.execute("ALTER TABLE trabajos ADD COLUMN intentos INTEGER NOT NULL DEFAULT 0")
+        self._podar(ttl_terminados)
+        self._conn.commit()
+
+    def _podar(self, ttl: int) -> None:
+        # Lotes terminados hace tiempo: ya no sirven ni para reconocer un relanzamiento
+        limite = time.time() - ttl
+        self._conn.execute(
+            "DELETE FROM trabajos WHERE lote_id IN (SELECT id FROM lotes WHERE terminado = 1 AND actualizado < ?)", (limite,))
+        self._conn.execute("DELETE FROM lotes WHERE terminado = 1 AND actualizado < ?", (limite,))
+
+    @staticmethod
+    def id_lote(url: str, items: List[Dict], parametros: Dict) -> str:
+        """Mismo enlace, mismos items y mismas opciones -> mismo lote (así se reconoce al re-lanzarlo)."""
+        urls = [i.get('url') for i in items]
+        clave = json.dumps({'url': url, 'items': urls, 'parametros': parametros}, sort_keys=True)
+        return hashlib.sha1(clave.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def estado_final(cls, parametros: Dict) -> str:
+        # En lotes de video no hay conversión ni etiquetado: terminan al descargar
+        return cls.DESCARGADO if parametros.get('tipo') == 'video' else cls.ETIQUETADO
+
+    @classmethod
+    def resumir_info(cls, info: Optional[Dict]) -> Optional[Dict]:
+        if not info: return None
+        return {k: v for k, v in info.items() if k not in cls._INFO_DESCARTABLE}
+
+    def abrir_lote(self, url: str, items: List[Dict], parametros: Dict) -> Tuple[str, Dict[int, Dict]]:
+        """
+        Registra el lote (o recupera uno sin terminar con los mismos datos).
+        Retorna (lote_id, {indice: trabajo}) con el estado guardado de cada item.
+        """
+        lote_id = self.id_lote(url, items, parametros)
+        ahora = time.time()
+        with self._lock:
+            fila = self._conn.execute("SELECT terminado FROM lotes WHERE id = ?", (lote_id,)).fetchone()
+            if fila and fila[0]:
+                # Un lote ya completado que se vuelve a lanzar empieza de cero
+                self._conn.execute("DELETE FROM trabajos WHERE lote_id = ?", (lote_id,))
+                fila = None
+            if not fila:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO lotes (id, url, parametros, terminado, creado, actualizado) VALUES (?, ?, ?, 0, ?, ?)",
+                    (lote_id, url, json.dumps(parametros), ahora, ahora))
+                self._conn.executemany(
+                    "INSERT INTO trabajos (lote_id, indice, item, estado, actualizado) VALUES (?, ?, ?, ?, ?)",
+                    [(lote_id, i, json.dumps(item), self.EN_COLA, ahora) for i, item in enumerate(items)])
+            self._conn.commit()
+            filas = self._conn.execute(
+                "SELECT indice, estado, ruta, info, resultado, motivo, intentos FROM trabajos WHERE lote_id = ?", (lote_id,)
+            ).fetchall()
+
+        trabajos = {}
+        for indice, estado, ruta, info, resultado, motivo, intentos in filas:
+            trabajos[indice] = {
+                'estado': estado, 'ruta': ruta, 'motivo': motivo, 'intentos': intentos,
+                'agotado': estado == self.FALLIDO and intentos >= self.MAX_INTENTOS,
+                'info': json.loads(info) if info else None,
+                'resultado': json.loads(resultado) if resultado else None,
+            }
+        return lote_id, trabajos
+
+    def marcar(self, lote_id: str, indice: int, estado: str, ruta: Optional[str] = None,
+               info: Optional[Dict] = None, resultado: Optional[Dict] = None, motivo: Optional[str] = None) -> None:
+        """
+        Actualiza el estado de un item. Los campos en None conservan su valor anterior.
+        Cada paso a 'fallido' suma un intento.
+        """
+        try:
+            with self._lock:
+                self._conn.execute(
+                    """UPDATE trabajos SET estado = ?, ruta = COALESCE(?, ruta), info = COALESCE(?, info),
+                       resultado = COALESCE(?, resultado), motivo = ?, intentos = intentos + ?, actualizado = ?
+                       WHERE lote_id = ? AND indice = ?""",
+                    (estado, ruta, json.dumps(self.resumir_info(info), default=str) if info else None,
+                     json.dumps(resultado, default=str) if resultado else None, motivo,
+                     1 if estado == self.FALLIDO else 0, time.time(), lote_id, indice))
+                self._conn.commit()
+        except Exception as e:
+            print(f"⚠️ Error guardando estado del lote: {e}")
+
+    def cerrar_lote(self, lote_id: str) -> bool:
+        """
+        Marca el lote como terminado si cada item está completo o fallido sin más intentos, y borra
+        sus items (con el info de yt-dlp de cada uno): un lote cerrado no se retoma. Retorna si se cerró.
+        """
+        with self._lock:
+            fila = self._conn.execute("SELECT parametros FROM lotes WHERE id = ?", (lote_id,)).fetchone()
+            if not fila: return False
+            final = self.estado_final(json.loads(fila[0]))
+            pendientes = self._conn.execute(
+                """SELECT COUNT(*) FROM trabajos WHERE lote_id = ? AND estado != ?
+                   AND NOT (estado = ? AND intentos >= ?)""",
+                (lote_id, final, self.FALLIDO, self.MAX_INTENTOS)
+            ).fetchone()[0]
+            if pendientes == 0:
+                self._conn.execute("UPDATE lotes SET terminado = 1, actualizado = ? WHERE id = ?", (time.time(), lote_id))
+                self._conn.execute("DELETE FROM trabajos WHERE lote_id = ?", (lote_id,))
+                self._conn.commit()
+            return pendientes == 0
+
+    def lotes_pendientes(self) -> List[Dict[str, Any]]:
+        """Lotes sin terminar, con lo necesario para relanzarlos: url, parámetros e items."""
+        with self._lock:
+            lotes = self._conn.execute(
+                "SELECT id, url, parametros, actualizado FROM lotes WHERE terminado = 0 ORDER BY actualizado DESC"
+            ).fetchall()
+            resultado = []
+            for lote_id, url, parametros, actualizado in lotes:
+                parametros = json.loads(parametros)
+                final = self.estado_final(parametros)
+                filas = self._conn.execute(
+                    "SELECT item, estado, intentos FROM trabajos WHERE lote_id = ? ORDER BY indice", (lote_id,)
+                ).fetchall()
+                resultado.append({
+                    'id': lote_id, 'url': url, 'parametros': parametros, 'actualizado': actualizado,
+                    'items': [json.loads(item) for item, _, _ in filas],
+                    'pendientes': sum(1 for _, estado, intentos in filas if estado != final
+                                      and not (estado == self.FALLIDO and intentos >= self.MAX_INTENTOS)),
+                })
+            return resultado
+
+    def descartar_lote(self, lote_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM trabajos WHERE lote_id = ?", (lote_id,))
+            self._conn.execute("DELETE FROM lotes WHERE id = ?", (lote_id,))
+            self._conn.commit()
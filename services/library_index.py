@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+
+
+class LibraryIndex:
+    """
+    Índice persistente (SQLite) de lo ya descargado: video_id + formato -> ruta final y tags.
+    Los archivos se renombran al etiquetar, así que el nombre de yt-dlp no sirve para saber
+    qué existe; este índice es lo que permite sincronizar una playlist descargando solo lo nuevo.
+    """
+
+    def __init__(self, ruta_db: str):
+        self.ruta_db = ruta_db
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta_db, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS biblioteca (
+                video_id TEXT NOT NULL,
+                formato TEXT NOT NULL,
+                ruta TEXT NOT NULL,
+                titulo TEXT,
+                artista TEXT,
+                album TEXT,
+                actualizado REAL NOT NULL,
+                PRIMARY KEY (video_id, formato)
+            )""")
+        self._conn.commit()
+
+    def registrar(self, video_id: Optional[str], formato: str, ruta: str, tags: Optional[Dict] = None) -> None:
+        """Registra (o actualiza) dónde quedó un video. 'tags' acepta el resultado de etiquetar (title/artist/album)."""
+        if not video_id or not ruta: return
+        tags = tags or {}
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO biblioteca (video_id, formato, ruta, titulo, artista, album, actualizado) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (video_id, formato, ruta, tags.get('title'), tags.get('artist'), tags.get('album'), time.time()))
+                self._conn.commit()
+        except Exception as e:
+            print(f"⚠️ Error registrando en la biblioteca: {e}")
+
+    def existentes(self, video_ids: Iterable[str], formato: str) -> Set[str]:
+        """De los video_ids dados, los que ya están en la biblioteca en este formato y cuyo archivo sigue en disco."""
+        ids = [v for v in video_ids if v]
+        encontrados = set()
+        with self._lock:
+            # En tandas para no superar el límite de parámetros de SQLite
+            for i in range(0, len(ids), 500):
+                tanda = ids[i:i + 500]
+                marcadores = ",".join("?" * len(tanda))
+                filas = self._conn.execute(
+                    f"SELECT video_id, ruta FROM biblioteca WHERE formato = ? AND video_id IN ({marcadores})",
+                    [formato] + tanda
+                ).fetchall()
+                encontrados.update(video_id for video_id, ruta in filas if os.path.exists(ruta))
+        return encontrados
@@ -1,16 +1,27 @@
 import asyncio
 import os
-import requests
-import base64
-import urllib.parse
 import re
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import ID3, APIC, TRCK, TPOS, ID3NoHeaderError, USLT
-from mutagen.oggopus import OggOpus
-from mutagen.flac import Picture
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Callable, List, Dict
+from services.cache_service import CacheService
+from services.http_client import HttpClient
+from services.cover_cache import CoverArtCache
+from services.providers import Proveedor
+from services.tag_writer import TagWriter
+from utils.utils import Utils
+from utils.matcher import Matcher
+from config.settings import (METADATA_CONCURRENCIA, METADATA_BUSQUEDA_CONCURRENTE, METADATA_VENTANA_CARRERA,
+                             METADATA_ESCALON_CARRERA,
+                             ALBUM_BUSCAR_LETRAS, ALBUM_TOLERANCIA_DURACION, SHAZAM_MODO_FRAGMENTO,
+                             SHAZAM_DURACION_VENTANA, SHAZAM_VENTANAS, SHAZAM_PROCESOS_DECODIFICACION,
+                             YTDLP_RUTA_RAPIDA, YTDLP_BUSCAR_LETRAS, METADATA_CANDIDATOS,
+                             METADATA_UMBRAL_COINCIDENCIA, METADATA_UMBRAL_ARTISTA)
 
 try:
+    import aiohttp
     from shazamio import Shazam, Serialize
+    from shazamio.exceptions import FailedDecodeJson
     HAS_SHAZAM = True
 except ImportError:
     HAS_SHAZAM = False
@@ -18,75 +29,395 @@ except ImportError:
 
 class MetadataService:
     """Servicio para etiquetar archivos de audio usando Shazam, iTunes, Deezer y LRCLIB."""
-    
-    def __init__(self):
-        pass 
-        
-    async def _buscar_shazam(self, ruta_archivo: str, status_callback=None):
+
+    DEEZER_SIN_DATOS = 800  # Código de error de Deezer para "no existe" (el resto son cuota/servicio)
+
+    def __init__(self, cache: Optional[CacheService] = None, http: Optional[HttpClient] = None,
+                 portadas: Optional[CoverArtCache] = None):
+        self.cache = cache
+        self.http = http or HttpClient.compartido()
+        self.portadas = portadas or CoverArtCache(http=self.http)
+        self.tag_writer = TagWriter()
+
+        # Un único event loop de larga vida (en su propio hilo) para todo el etiquetado
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._limite = None
+        self._shazam = None
+        self._pool_decodificacion = None
+
+        # Límite de tasa, reintentos y circuit breaker por proveedor (se usan dentro del loop)
+        self.proveedores = {nombre: Proveedor.desde_config(nombre) for nombre in ('itunes', 'deezer', 'lrclib', 'shazam')}
+
+    def _obtener_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="metadata-loop", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def _ejecutar(self, coro):
+        """Ejecuta la corrutina en el loop persistente y bloquea el hilo llamador hasta el resultado."""
+        return asyncio.run_coroutine_threadsafe(coro, self._obtener_loop()).result()
+
+    def _obtener_pool_decodificacion(self) -> ProcessPoolExecutor:
+        # Decodificar es CPU: en procesos aparte para no frenar los hilos del lote ni el loop
+        if self._pool_decodificacion is None:
+            self._pool_decodificacion = ProcessPoolExecutor(max_workers=SHAZAM_PROCESOS_DECODIFICACION)
+        return self._pool_decodificacion
+
+    async def _decodificar(self, funcion, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._obtener_pool_decodificacion(), funcion, *args)
+
+    def _obtener_shazam(self):
+        # Solo se usa dentro del loop, así que no necesita lock
+        if self._shazam is None:
+            self._shazam = Shazam()
+        return self._shazam
+
+    async def _consultar_json(self, proveedor: str, url: str, params: dict = None,
+                              es_vacio: Callable = None):
+        """GET JSON con caché persistente. Retorna los datos o None si no hubo resultado (o falló)."""
+        consulta = {'_url': url, **(params or {})}
+        if self.cache:
+            encontrado, valor = self.cache.obtener(proveedor, consulta)
+            if encontrado:
+                return valor
+
+        interpretado = {}
+
+        async def pedir():
+            resp = await asyncio.to_thread(self.http.get, url, params)
+            interpretado['data'] = self._interpretar_respuesta(proveedor, consulta, resp, es_vacio)
+            return resp
+
+        def pedir_protegido():
+            # Si la búsqueda se cancela (perdió la carrera) con la petición ya enviada, la respuesta
+            # igual se procesa y queda en la caché en vez de descartarse
+            tarea = asyncio.ensure_future(pedir())
+            tarea.add_done_callback(lambda t: t.cancelled() or t.exception())
+            return asyncio.shield(tarea)
+
+        await self.proveedores[proveedor].ejecutar(
+            pedir_protegido,
+            reintentar_respuesta=HttpClient.debe_reintentar,
+            reintentar_excepcion=HttpClient.es_error_transitorio,
+            retry_after=HttpClient.retry_after
+        )
+        return interpretado.get('data')
+
+    def _interpretar_respuesta(self, proveedor: str, consulta: dict, resp, es_vacio: Callable = None):
+        """Datos de la respuesta (o None) y su registro en la caché, incluido el caché negativo."""
+        if resp.status_code == 200:
+            data = resp.json()
+            error = data.get('error') if isinstance(data, dict) else None
+            if error:
+                # Error dentro de un 200 (p. ej. cuota de Deezer, code 4): no se cachea.
+                # Solo "sin datos" (code 800) es un resultado negativo real.
+                if isinstance(error, dict) and error.get('code') == self.DEEZER_SIN_DATOS:
+                    if self.cache: self.cache.guardar(proveedor, consulta, None)
+                else:
+                    print(f"⚠️ {proveedor}: {error}")
+                return None
+            if es_vacio and es_vacio(data):
+                if self.cache: self.cache.guardar(proveedor, consulta, None)
+                return None
+            if self.cache: self.cache.guardar(proveedor, consulta, data)
+            return data
+        elif resp.status_code == 404:
+            # Caché negativo: no volver a preguntar por algo que no existe
+            if self.cache: self.cache.guardar(proveedor, consulta, None)
+        return None
+
+    @staticmethod
+    async def _nada():
+        return None
+
+    async def _buscar_en_proveedor(self, fuente: str, query: str, contexto: Dict) -> Optional[Dict]:
+        """
+        Una búsqueda en iTunes o Deezer que trae los METADATA_CANDIDATOS primeros resultados y los
+        puntúa todos (título, artista y duración según 'contexto'). Retorna el mejor resultado crudo
+        si supera el umbral, o None.
+        """
+        if fuente == 'itunes':
+            print(f"🔎 Probando búsqueda iTunes: '{query}'")
+            data = await self._consultar_json(
+                'itunes', "https://itunes.apple.com/search",
+                {'term': query, 'media': 'music', 'entity': 'song', 'limit': METADATA_CANDIDATOS},
+                es_vacio=lambda d: not d.get('resultCount')
+            )
+            candidatos = [
+                (r, r.get('trackName'), r.get('artistName'), (r.get('trackTimeMillis') or 0) / 1000)
+                for r in (data or {}).get('results', [])
+            ]
+        else:
+            data = await self._consultar_json(
+                'deezer', "https://api.deezer.com/search", {'q': query, 'limit': METADATA_CANDIDATOS},
+                es_vacio=lambda d: not d.get('data')
+            )
+            candidatos = [
+                (r, r.get('title'), r.get('artist', {}).get('name'), r.get('duration'))
+                for r in (data or {}).get('data', [])
+            ]
+
+        mejor, mejor_score = None, 0.0
+        for res, titulo, artista, duracion in candidatos:
+            if not self._es_coincidencia_valida(contexto['titulo'], titulo):
+                continue
+            # Con artista conocido, un título parecido de otro artista es otra canción (no solo en modo estricto)
+            if contexto.get('artista') and not Matcher.artista_compatible(contexto['artista'], artista, METADATA_UMBRAL_ARTISTA):
+                continue
+            score = Matcher.puntuar(contexto['titulo'], titulo, contexto.get('artista'), artista,
+                                    contexto.get('duracion'), duracion)
+            if score > mejor_score:
+                mejor, mejor_score = res, score
+
+        return mejor if mejor_score >= METADATA_UMBRAL_COINCIDENCIA else None
+
+    async def _buscar_por_id(self, ids: Dict):
+        """
+        Búsqueda exacta por identificador: iTunes lookup?id= (trackId) o Deezer track/isrc:.
+        Una sola llamada sin comparación difusa. Retorna (fuente, resultado) o (None, None).
+        """
+        try:
+            if ids.get('itunes_id'):
+                data = await self._consultar_json(
+                    'itunes', "https://itunes.apple.com/lookup", {'id': ids['itunes_id']},
+                    es_vacio=lambda d: not d.get('resultCount')
+                )
+                res = next((r for r in (data or {}).get('results', []) if r.get('wrapperType') == 'track'), None)
+                if res:
+                    print(f"🎯 iTunes por ID: {res.get('trackName')}")
+                    return 'itunes', res
+            if ids.get('isrc'):
+                res = await self._consultar_json(
+                    'deezer', f"https://api.deezer.com/track/isrc:{ids['isrc']}"
+                )
+                if res and res.get('id'):
+                    print(f"🎯 Deezer por ISRC {ids['isrc']}: {res.get('title')}")
+                    return 'deezer', res
+        except Exception as e:
+            print(f"Error búsqueda por ID: {e}")
+        return None, None
+
+    async def _buscar_secuencial(self, estrategias: List[str], contexto: Dict):
+        """Modo clásico: cada estrategia en iTunes, y luego cada una en Deezer. Retorna (fuente, resultado)."""
+        for fuente in ('itunes', 'deezer'):
+            if fuente == 'deezer': print(f"⚠️ iTunes incompleto. Probando Deezer...")
+            for query in estrategias:
+                try:
+                    res = await self._buscar_en_proveedor(fuente, query, contexto)
+                    if res: return fuente, res
+                except Exception as e:
+                    print(f"Error {fuente}: {e}")
+        return None, None
+
+    async def _buscar_en_carrera(self, estrategias: List[str], contexto: Dict):
+        """
+        Búsqueda escalonada contra iTunes y Deezer: la primera estrategia sale a los dos a la vez y
+        la siguiente solo si las lanzadas no encontraron nada o tardan más de METADATA_ESCALON_CARRERA
+        (así no se gasta el cupo de los proveedores en consultas que casi nunca hacen falta).
+        Gana el candidato válido de mayor prioridad (iTunes antes que Deezer, luego orden de
+        estrategias): en cuanto llega el primero válido se espera como mucho METADATA_VENTANA_CARRERA
+        por uno mejor entre lo ya lanzado y se cancela el resto. Retorna (fuente, resultado).
+        """
+        if not estrategias: return None, None
+        fuentes = ('itunes', 'deezer')
+        tareas = {}
+        pendientes = set()
+        lanzadas = 0
+        mejor = None  # (rango, fuente, resultado)
+        limite = None
+        loop = asyncio.get_running_loop()
+
+        def lanzar_siguiente():
+            nonlocal lanzadas
+            query = estrategias[lanzadas]
+            for orden_fuente, fuente in enumerate(fuentes):
+                tarea = asyncio.create_task(self._buscar_en_proveedor(fuente, query, contexto))
+                tareas[tarea] = (orden_fuente * len(estrategias) + lanzadas, fuente)
+                pendientes.add(tarea)
+            lanzadas += 1
+
+        lanzar_siguiente()
+        try:
+            while pendientes:
+                if mejor:
+                    espera = max(0.0, limite - loop.time())
+                elif lanzadas < len(estrategias):
+                    espera = METADATA_ESCALON_CARRERA
+                else:
+                    espera = None
+                hechas, pendientes = await asyncio.wait(pendientes, timeout=espera, return_when=asyncio.FIRST_COMPLETED)
+                if not hechas and mejor:
+                    break  # Ventana agotada
+
+                for tarea in hechas:
+                    rango, fuente = tareas[tarea]
+                    try:
+                        res = tarea.result()
+                    except Exception as e:
+                        print(f"Error {fuente}: {e}")
+                        continue
+                    if res and (mejor is None or rango < mejor[0]):
+                        mejor = (rango, fuente, res)
+
+                if mejor:
+                    # Si nada pendiente puede superar al actual, no hay que esperar más
+                    if all(tareas[t][0] > mejor[0] for t in pendientes):
+                        break
+                    if limite is None:
+                        limite = loop.time() + METADATA_VENTANA_CARRERA
+                elif lanzadas < len(estrategias) and (not hechas or not pendientes):
+                    # Escalón: lo lanzado tarda demasiado o ya falló entero
+                    lanzar_siguiente()
+        finally:
+            for tarea in pendientes:
+                tarea.cancel()
+
+        if mejor:
+            return mejor[1], mejor[2]
+        return None, None
+
+    async def _buscar_shazam(self, ruta_archivo: str, status_callback=None, video_id: str = None):
+        """
+        Shazam con caché persistente: la clave es el ID de YouTube (si se conoce) y el hash del audio
+        decodificado, así un mismo tema se reconoce una sola vez aunque se re-etiquete o se mueva.
+        """
         if not HAS_SHAZAM:
              print("⚠️ Shazam no está instalado. Saltando.")
              return None
 
+        claves = []
+        if self.cache:
+            if video_id:
+                claves.append(f"yt:{video_id}")
+                encontrado, datos = self.cache.obtener('shazam', claves[0])
+                if encontrado:
+                    print(f"♻️ Shazam (caché por video): {datos['titulo'] if datos else 'sin coincidencia'}")
+                    return datos
+            huella = await self._decodificar(Utils.huella_audio, ruta_archivo)
+            if huella:
+                claves.append(f"pcm:{huella}")
+                encontrado, datos = self.cache.obtener('shazam', claves[-1])
+                if encontrado:
+                    print(f"♻️ Shazam (caché por audio): {datos['titulo'] if datos else 'sin coincidencia'}")
+                    if video_id: self.cache.guardar('shazam', claves[0], datos)
+                    return datos
+
         try:
             if status_callback: status_callback("🔍 Escuchando con Shazam...")
-            shazam = Shazam()
-            out = await shazam.recognize(ruta_archivo)
-            
-            if not out or 'track' not in out:
-                return None
-                
-            track = out['track']
-            titulo = track.get('title')
-            artista = track.get('subtitle')
-            
-            # Metadata extra
-            album = None
-            genero = None
-            imagen_url = None
-            anio = None
-            letra = None
-            
-            if 'sections' in track:
-                for section in track['sections']:
-                    if section.get('type') == 'SONG':
-                        for meta in section.get('metadata', []):
-                            if meta.get('title') == 'Album':
-                                album = meta.get('text')
-                            elif meta.get('title') == 'Released':
-                                try:
-                                    anio = meta.get('text')[:4]
-                                except: pass
-                    if section.get('type') == 'LYRICS':
-                        letra_list = section.get('text', [])
-                        if letra_list:
-                            letra = "\n".join(letra_list)
-            
-            if 'genres' in track:
-                genero = track['genres'].get('primary')
-                
-            if 'images' in track:
-                imagen_url = track['images'].get('coverart') # O coverarthq
-            
-            print(f"✅ Reconocido por Shazam: {titulo} - {artista} ({anio})")
-            if letra: print("✅ Letra encontrada.")
-            if status_callback: status_callback(f"✅ Shazam: {titulo} - {artista}")
-            
-            return {
-                'titulo': titulo,
-                'artista': artista,
-                'album': album or "Sencillo",
-                'genero': genero or "Desconocido",
-                'track_number': None, 
-                'disc_number': None,
-                'disc_count': None,
-                'imagen_url': imagen_url,
-                'anio': anio,
-                'letra': letra
-            }
-
+            datos = await self._reconocer_shazam(ruta_archivo, status_callback)
         except Exception as e:
             print(f"Error Shazam: {e}")
+            return None  # Los errores no se cachean
+
+        for clave in claves:
+            self.cache.guardar('shazam', clave, datos)
+        return datos
+
+    def _ventanas_shazam(self, duracion: Optional[float]) -> List[float]:
+        """Inicios (en segundos) de cada fragmento a probar. Vacío = usar el archivo completo."""
+        if not duracion or duracion <= SHAZAM_DURACION_VENTANA * 1.5:
+            return []
+        ultimo_inicio = duracion - SHAZAM_DURACION_VENTANA
+        return [max(0.0, min(duracion * fraccion, ultimo_inicio)) for fraccion in SHAZAM_VENTANAS]
+
+    @staticmethod
+    def _es_error_red_shazam(error: Exception) -> bool:
+        # Red, timeout o límite de Shazam (responde 429 con HTML, que falla al decodificar el JSON).
+        # Lo local (ffmpeg, archivo dañado, ValueError del recorte) no es culpa del proveedor.
+        return (isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError, FailedDecodeJson))
+                or '429' in str(error))
+
+    async def _reconocer_shazam(self, ruta_archivo: str, status_callback=None) -> Optional[Dict]:
+        """Reconoce el audio con Shazam. None si no hay coincidencia; las excepciones se propagan."""
+        out = None
+        usado_fragmento = False
+        if SHAZAM_MODO_FRAGMENTO:
+            duracion = await asyncio.to_thread(Utils.duracion_audio, ruta_archivo)
+            for inicio in self._ventanas_shazam(duracion):
+                fragmento = await self._decodificar(Utils.decodificar_fragmento, ruta_archivo, inicio, SHAZAM_DURACION_VENTANA)
+                if not fragmento:
+                    break  # Sin ffmpeg: se reconoce el archivo completo
+                usado_fragmento = True
+                out = await self.proveedores['shazam'].ejecutar(
+                    lambda: self._obtener_shazam().recognize(fragmento),
+                    # Shazam limita con errores, no con códigos HTTP
+                    reintentar_excepcion=self._es_error_red_shazam, es_error_remoto=self._es_error_red_shazam
+                )
+                if out and 'track' in out:
+                    break
+                print(f"🔁 Shazam sin coincidencia en {int(inicio)}s, probando otra ventana...")
+
+        if not usado_fragmento:
+            out = await self.proveedores['shazam'].ejecutar(
+                lambda: self._obtener_shazam().recognize(ruta_archivo),
+                reintentar_excepcion=self._es_error_red_shazam, es_error_remoto=self._es_error_red_shazam
+            )
+        
+        if not out or 'track' not in out:
             return None
+            
+        track = out['track']
+        titulo = track.get('title')
+        artista = track.get('subtitle')
+        
+        # Metadata extra
+        album = None
+        genero = None
+        imagen_url = None
+        anio = None
+        letra = None
+        
+        if 'sections' in track:
+            for section in track['sections']:
+                if section.get('type') == 'SONG':
+                    for meta in section.get('metadata', []):
+                        if meta.get('title') == 'Album':
+                            album = meta.get('text')
+                        elif meta.get('title') == 'Released':
+                            try:
+                                anio = meta.get('text')[:4]
+                            except: pass
+                if section.get('type') == 'LYRICS':
+                    letra_list = section.get('text', [])
+                    if letra_list:
+                        letra = "\n".join(letra_list)
+        
+        if 'genres' in track:
+            genero = track['genres'].get('primary')
+            
+        if 'images' in track:
+            imagen_url = track['images'].get('coverart') # O coverarthq
+
+        # Identificadores estables para búsquedas exactas en otros proveedores
+        isrc = track.get('isrc')
+        itunes_id = None
+        for action in track.get('hub', {}).get('actions', []) or []:
+            if action.get('type') == 'applemusicplay' and action.get('id'):
+                itunes_id = action['id']
+        
+        print(f"✅ Reconocido por Shazam: {titulo} - {artista} ({anio})")
+        if letra: print("✅ Letra encontrada.")
+        if status_callback: status_callback(f"✅ Shazam: {titulo} - {artista}")
+        
+        return {
+            'titulo': titulo,
+            'artista': artista,
+            'album': album or "Sencillo",
+            'genero': genero or "Desconocido",
+            'track_number': None, 
+            'disc_number': None,
+            'disc_count': None,
+            'imagen_url': imagen_url,
+            'anio': anio,
+            'letra': letra,
+            'isrc': isrc,
+            'itunes_id': itunes_id
+        }
 
     async def _buscar_letra_lrclib(self, titulo: str, artista: str, album: str = None, duration: int = None) -> str:
         """Busca la letra en LRCLIB (Fallback)."""
@@ -101,31 +432,29 @@ class MetadataService:
 
             url = "https://lrclib.net/api/get"
             
-            resp = await asyncio.to_thread(requests.get, url, params=params, timeout=5)
+            data = await self._consultar_json('lrclib', url, params)
             
-            if resp.status_code == 200:
-                data = resp.json()
+            if data:
                 lyrics = data.get('plainLyrics')
                 if lyrics:
                     print("✅ Letra encontrada en LRCLIB.")
                     return lyrics
-            elif resp.status_code == 404:
+            else:
                 url_search = "https://lrclib.net/api/search"
-                resp_search = await asyncio.to_thread(requests.get, url_search, params={'q': f"{titulo} {artista}"}, timeout=5)
-                if resp_search.status_code == 200:
-                    results = resp_search.json()
-                    if results and isinstance(results, list):
-                        first = results[0]
-                        lyrics = first.get('plainLyrics')
-                        if lyrics:
-                            print("✅ Letra encontrada en LRCLIB (Búsqueda laxa).")
-                            return lyrics
+                results = await self._consultar_json('lrclib', url_search, {'q': f"{titulo} {artista}"},
+                                                     es_vacio=lambda d: not d or not isinstance(d, list))
+                if results:
+                    first = results[0]
+                    lyrics = first.get('plainLyrics')
+                    if lyrics:
+                        print("✅ Letra encontrada en LRCLIB (Búsqueda laxa).")
+                        return lyrics
 
         except Exception as e:
             print(f"⚠️ Error LRCLIB: {e}")
         return None
 
-    async def _etiquetar_async(self, ruta_archivo: str, artista_hint: str = None, status_callback=None, strict_artist_match: bool = False, search_title: str = None):
+    async def _etiquetar_async(self, ruta_archivo: str, artista_hint: str = None, status_callback=None, strict_artist_match: bool = False, search_title: str = None, video_id: str = None, datos_previos: Dict = None):
         nombre_archivo = os.path.basename(ruta_archivo)
         
         # 1. Preparar términos de búsqueda (Defaults)
@@ -150,9 +479,15 @@ class MetadataService:
         letra = None
         
         datos_encontrados = False
+        ids = {'isrc': None, 'itunes_id': None, 'deezer_id': None}
 
-        # 3. Intentar Shazam (Prioridad)
-        datos_shazam = await self._buscar_shazam(ruta_archivo, status_callback)
+        # 3. Metadatos oficiales de yt-dlp (ruta rápida) o Shazam (Prioridad)
+        ruta_rapida = bool(YTDLP_RUTA_RAPIDA and datos_previos and datos_previos.get('confiable'))
+        if ruta_rapida:
+            print(f"⚡ Metadatos oficiales de YouTube: {datos_previos['titulo']} - {datos_previos['artista']} (sin Shazam)")
+            datos_shazam = datos_previos
+        else:
+            datos_shazam = await self._buscar_shazam(ruta_archivo, status_callback, video_id)
         if datos_shazam:
             titulo = datos_shazam['titulo']
             artista = datos_shazam['artista']
@@ -164,6 +499,8 @@ class MetadataService:
             imagen_url = datos_shazam['imagen_url']
             anio = datos_shazam['anio']
             letra = datos_shazam['letra']
+            ids['isrc'] = datos_shazam.get('isrc')
+            ids['itunes_id'] = datos_shazam.get('itunes_id')
             datos_encontrados = True
         else:
             if status_callback: 
@@ -173,7 +510,12 @@ class MetadataService:
         
         # 4. Determinar Estrategia de Búsqueda API
         estrategias = []
-        if datos_encontrados:
+        if ruta_rapida:
+            # Solo se sale a la red si falta algo esencial (álbum o año)
+            if album == "Sencillo" or not anio:
+                estrategias.append(f"{titulo} {artista}")
+                print(f"🔄 Completando campos faltantes para: '{titulo} {artista}'")
+        elif datos_encontrados:
             q_enrich = f"{titulo} {artista}"
             estrategias.append(q_enrich)
             print(f"🔄 Enriqueciendo metadatos para: '{q_enrich}'")
@@ -195,121 +537,113 @@ class MetadataService:
             if not strict_artist_match:
                 estrategias.append(clean_query)
 
-        # 5. Ejecutar Búsqueda API (iTunes / Deezer)
-        exito_api = False
-        
-        for query in estrategias:
-            if exito_api: break
+        # Sin repetidos (p. ej. "Adele - Hello" genera la misma consulta por dos caminos)
+        vistas, unicas = set(), []
+        for estrategia in estrategias:
+            clave = re.sub(r'\s+', ' ', estrategia or '').strip().lower()
+            if clave and clave not in vistas:
+                vistas.add(clave)
+                unicas.append(estrategia.strip())
+        estrategias = unicas
+
+        # 5. Ejecutar Búsqueda API: primero exacta por ID, luego búsqueda libre (iTunes / Deezer)
+        fuente, res = None, None
+        if estrategias and (ids['itunes_id'] or ids['isrc']):
+            fuente, res = await self._buscar_por_id(ids)
+        if not fuente:
+            artista_obj = artista if datos_encontrados else artista_hint
+            if artista_obj:
+                artista_obj = re.sub(r'(VEVO|Official|Topic)', '', artista_obj, flags=re.IGNORECASE).strip(' -')
+            contexto = {
+                'titulo': titulo if datos_encontrados else clean_query,
+                'artista': artista_obj if artista_obj != "Desconocido" else None,
+                'duracion': await asyncio.to_thread(Utils.duracion_audio, ruta_archivo),
+                'estricto': strict_artist_match
+            }
+            if METADATA_BUSQUEDA_CONCURRENTE:
+                fuente, res = await self._buscar_en_carrera(estrategias, contexto)
+            else:
+                fuente, res = await self._buscar_secuencial(estrategias, contexto)
+
+        if fuente == 'itunes':
+            ids['itunes_id'] = ids['itunes_id'] or res.get('trackId')
+            candidate_title = res.get('trackName')
+            if not datos_encontrados:
+                titulo = candidate_title
+                artista = res.get('artistName')
+                datos_encontrados = True
+
+            # ENRIQUECIMIENTO
+            itunes_album = res.get('collectionName')
+            if itunes_album and not (ruta_rapida and album != "Sencillo"): album = itunes_album 
             
-            print(f"🔎 Probando búsqueda iTunes: '{query}'")
-            try:
-                encoded_query = urllib.parse.quote(query)
-                url_itunes = f"https://itunes.apple.com/search?term={encoded_query}&media=music&entity=song&limit=1"
+            if not genero or genero == "Desconocido": genero = res.get('primaryGenreName', genero)
+            
+            if not track_number: track_number = res.get('trackNumber')
+            if not disc_number: disc_number = res.get('discNumber')
+            if not disc_count: disc_count = res.get('discCount')
+            
+            if not anio:
+                release_date = res.get('releaseDate')
+                if release_date: anio = release_date[:4]
                 
-                resp = await asyncio.to_thread(requests.get, url_itunes, timeout=5)
+            if not imagen_url:
+                 work_art = res.get('artworkUrl100')
+                 if work_art: imagen_url = work_art.replace('100x100', '600x600')
+
+            artista = self._limpiar_artista(artista)
+            print(f"✅ Datos iTunes aplicados: Track {track_number}, Disc {disc_number}, Año {anio}")
+            if status_callback: status_callback(f"✅ Metadata Completa (iTunes)")
+
+        elif fuente == 'deezer':
+            ids['deezer_id'] = res.get('id')
+            ids['isrc'] = ids['isrc'] or res.get('isrc')
+            candidate_title = res.get('title')
+            if not datos_encontrados:
+                titulo = candidate_title
+                artista = res.get('artist', {}).get('name')
+                datos_encontrados = True
+
+            if not album or album == "Sencillo": 
+                dz_album = res.get('album', {}).get('title')
+                if dz_album: album = dz_album
                 
-                if resp.status_code == 200:
-                    data = resp.json()
-                    if data['resultCount'] > 0:
-                        res = data['results'][0]
-                        candidate_title = res.get('trackName')
-                        
-                        target_compare = titulo if datos_encontrados else clean_query
-                        
-                        if not self._es_coincidencia_valida(target_compare, candidate_title):
-                            continue
-                            
-                        if not datos_encontrados:
-                            titulo = candidate_title
-                            artista = res.get('artistName')
-                            datos_encontrados = True
-
-                        # ENRIQUECIMIENTO
-                        itunes_album = res.get('collectionName')
-                        if itunes_album: album = itunes_album 
-                        
-                        if not genero or genero == "Desconocido": genero = res.get('primaryGenreName', genero)
-                        
-                        if not track_number: track_number = res.get('trackNumber')
-                        if not disc_number: disc_number = res.get('discNumber')
-                        if not disc_count: disc_count = res.get('discCount')
-                        
-                        if not anio:
-                            release_date = res.get('releaseDate')
-                            if release_date: anio = release_date[:4]
-                            
-                        if not imagen_url:
-                             work_art = res.get('artworkUrl100')
-                             if work_art: imagen_url = work_art.replace('100x100', '600x600')
-
-                        artista = self._limpiar_artista(artista)
-                        print(f"✅ Datos iTunes aplicados: Track {track_number}, Disc {disc_number}, Año {anio}")
-                        exito_api = True
-                        if status_callback: status_callback(f"✅ Metadata Completa (iTunes)")
-            except Exception as e:
-                print(f"Error iTunes: {e}")
-
-        # --- FALLBACK DEEZER ---
-        if not exito_api and (not datos_encontrados or not track_number):
-             print(f"⚠️ iTunes incompleto. Probando Deezer...")
-             for query in estrategias:
-                if exito_api: break
-                try:
-                    encoded_query = urllib.parse.quote(query)
-                    url_deezer = f"https://api.deezer.com/search?q={encoded_query}&limit=1"
-                    resp = await asyncio.to_thread(requests.get, url_deezer, timeout=5)
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        if 'data' in data and len(data['data']) > 0:
-                            res = data['data'][0]
-                            candidate_title = res.get('title')
-                            
-                            target_compare = titulo if datos_encontrados else clean_query
-                            if not self._es_coincidencia_valida(target_compare, candidate_title): continue
-
-                            if not datos_encontrados:
-                                titulo = candidate_title
-                                artista = res.get('artist', {}).get('name')
-                                datos_encontrados = True
-
-                            if not album or album == "Sencillo": 
-                                dz_album = res.get('album', {}).get('title')
-                                if dz_album: album = dz_album
-                                
-                            if not imagen_url:
-                                imagen_url = res.get('album', {}).get('cover_xl') or res.get('album', {}).get('cover_big')
+            if not imagen_url:
+                imagen_url = res.get('album', {}).get('cover_xl') or res.get('album', {}).get('cover_big')
 
-                            try:
-                                track_id = res.get('id')
-                                if track_id:
-                                    url_track = f"https://api.deezer.com/track/{track_id}"
-                                    resp_track = await asyncio.to_thread(requests.get, url_track, timeout=5)
-                                    if resp_track.status_code == 200:
-                                        track_data = resp_track.json()
-                                        if not track_number: track_number = track_data.get('track_position')
-                                        if not disc_number: disc_number = track_data.get('disk_number')
-                                        if not anio:
-                                            rd = track_data.get('release_date')
-                                            if rd: anio = rd[:4]
-                                        
-                                        if not genero or genero == "Desconocido":
-                                            ab_id = track_data.get('album', {}).get('id')
-                                            if ab_id:
-                                                 url_album = f"https://api.deezer.com/album/{ab_id}"
-                                                 r_ab = await asyncio.to_thread(requests.get, url_album, timeout=5)
-                                                 if r_ab.status_code == 200:
-                                                     d_ab = r_ab.json()
-                                                     g_data = d_ab.get('genres', {}).get('data', [])
-                                                     if g_data: genero = g_data[0].get('name')
-                                                     if not anio:
-                                                         rd = d_ab.get('release_date')
-                                                         if rd: anio = rd[:4]
-                            except: pass
-                            
-                            artista = self._limpiar_artista(artista)
-                            print(f"✅ Datos Deezer aplicados: Track {track_number}")
-                            exito_api = True
-                except: pass
+            try:
+                # /track y /album son independientes (el id del álbum ya viene en la búsqueda): en paralelo.
+                # Si res ya es un /track completo (búsqueda por ISRC) no se vuelve a pedir.
+                track_id = res.get('id') if 'track_position' not in res else None
+                ab_id = res.get('album', {}).get('id')
+                necesita_album = (not genero or genero == "Desconocido") and ab_id
+                track_data, d_ab = await asyncio.gather(
+                    self._consultar_json('deezer', f"https://api.deezer.com/track/{track_id}") if track_id else self._nada(),
+                    self._consultar_json('deezer', f"https://api.deezer.com/album/{ab_id}") if necesita_album else self._nada(),
+                    return_exceptions=True
+                )
+                for err in (track_data, d_ab):
+                    if isinstance(err, Exception): print(f"⚠️ Error detalles Deezer: {err}")
+                if 'track_position' in res:
+                    track_data = res
+                if isinstance(track_data, dict):
+                    ids['isrc'] = ids['isrc'] or track_data.get('isrc')
+                    if not track_number: track_number = track_data.get('track_position')
+                    if not disc_number: disc_number = track_data.get('disk_number')
+                    if not anio:
+                        rd = track_data.get('release_date')
+                        if rd: anio = rd[:4]
+                if isinstance(d_ab, dict):
+                    g_data = d_ab.get('genres', {}).get('data', [])
+                    if g_data: genero = g_data[0].get('name')
+                    if not anio:
+                        rd = d_ab.get('release_date')
+                        if rd: anio = rd[:4]
+            except Exception as e:
+                print(f"⚠️ Error aplicando detalles Deezer: {e}")
+            
+            artista = self._limpiar_artista(artista)
+            print(f"✅ Datos Deezer aplicados: Track {track_number}")
 
         if not datos_encontrados:
              print(f"⚠️ No se encontraron metadatos para: {nombre_archivo}")
@@ -317,7 +651,7 @@ class MetadataService:
 
         # --- FALLBACK FINAL LETRA (LRCLIB) ---
         try:
-            if not letra and (datos_encontrados or titulo):
+            if not letra and (datos_encontrados or titulo) and (not ruta_rapida or YTDLP_BUSCAR_LETRAS):
                  safe_titulo = titulo if titulo else titulo_busqueda
                  safe_artista = artista if artista else (artista_hint or "")
                  
@@ -326,16 +660,150 @@ class MetadataService:
         except Exception as e:
             print(f"❌ Error en bloque fallback LRCLIB: {e}")
 
+        res = await self._guardar_y_renombrar(ruta_archivo, datos_encontrados, status_callback, titulo, artista, album, genero, track_number, disc_number, disc_count, imagen_url, anio, letra, ids)
+        # De dónde salió el artista: solo lo de 'busqueda' (texto libre) es una suposición corregible
+        if res: res['fuente_artista'] = 'ytdlp' if ruta_rapida else ('shazam' if datos_shazam else 'busqueda')
+        return res
+
+    # --- MODO ÁLBUM ---
+
+    async def _resolver_album_async(self, titulo_album: str, artista: str = None) -> Optional[Dict]:
+        """
+        Obtiene UNA vez el tracklist completo de un álbum (iTunes lookup, con Deezer de respaldo).
+        Retorna {'album', 'artista', 'genero', 'anio', 'imagen_url', 'disc_count', 'pistas': [...]}
+        donde cada pista tiene titulo, artista, track_number, disc_number y duracion (segundos).
+        """
+        query = f"{titulo_album} {artista}" if artista else titulo_album
+        print(f"💿 Resolviendo álbum completo: '{query}'")
+
+        try:
+            data = await self._consultar_json(
+                'itunes', "https://itunes.apple.com/search",
+                {'term': query, 'media': 'music', 'entity': 'album', 'limit': 1},
+                es_vacio=lambda d: not d.get('resultCount')
+            )
+            if data and self._es_coincidencia_valida(titulo_album, data['results'][0].get('collectionName')):
+                collection_id = data['results'][0].get('collectionId')
+                lookup = await self._consultar_json(
+                    'itunes', "https://itunes.apple.com/lookup", {'id': collection_id, 'entity': 'song'},
+                    es_vacio=lambda d: not d.get('resultCount')
+                )
+                if lookup:
+                    coleccion = next((r for r in lookup['results'] if r.get('wrapperType') == 'collection'), {})
+                    pistas = [{
+                        'titulo': r.get('trackName'),
+                        'artista': r.get('artistName'),
+                        'track_number': r.get('trackNumber'),
+                        'disc_number': r.get('discNumber'),
+                        'disc_count': r.get('discCount'),
+                        'duracion': (r.get('trackTimeMillis') or 0) / 1000 or None,
+                    } for r in lookup['results'] if r.get('wrapperType') == 'track']
+                    if pistas:
+                        art = coleccion.get('artworkUrl100')
+                        fecha = coleccion.get('releaseDate')
+                        print(f"✅ Álbum iTunes: {coleccion.get('collectionName')} ({len(pistas)} pistas)")
+                        return {
+                            'album': coleccion.get('collectionName'),
+                            'artista': self._limpiar_artista(coleccion.get('artistName')),
+                            'genero': coleccion.get('primaryGenreName') or "Desconocido",
+                            'anio': fecha[:4] if fecha else None,
+                            'imagen_url': art.replace('100x100', '600x600') if art else None,
+                            'disc_count': max((p['disc_count'] or 1) for p in pistas),
+                            'pistas': pistas
+                        }
+        except Exception as e:
+            print(f"Error iTunes (álbum): {e}")
+
+        try:
+            data = await self._consultar_json(
+                'deezer', "https://api.deezer.com/search/album", {'q': query, 'limit': 1},
+                es_vacio=lambda d: not d.get('data')
+            )
+            if data and self._es_coincidencia_valida(titulo_album, data['data'][0].get('title')):
+                ab_id = data['data'][0].get('id')
+                d_ab, d_tracks = await asyncio.gather(
+                    self._consultar_json('deezer', f"https://api.deezer.com/album/{ab_id}"),
+                    self._consultar_json('deezer', f"https://api.deezer.com/album/{ab_id}/tracks", {'limit': 500})
+                )
+                if d_ab and d_tracks and d_tracks.get('data'):
+                    pistas = [{
+                        'titulo': t.get('title'),
+                        'artista': t.get('artist', {}).get('name'),
+                        'track_number': t.get('track_position'),
+                        'disc_number': t.get('disk_number'),
+                        'disc_count': None,
+                        'duracion': t.get('duration'),
+                    } for t in d_tracks['data']]
+                    disc_count = max((p['disc_number'] or 1) for p in pistas)
+                    for p in pistas: p['disc_count'] = disc_count
+                    g_data = d_ab.get('genres', {}).get('data', [])
+                    rd = d_ab.get('release_date')
+                    print(f"✅ Álbum Deezer: {d_ab.get('title')} ({len(pistas)} pistas)")
+                    return {
+                        'album': d_ab.get('title'),
+                        'artista': self._limpiar_artista(d_ab.get('artist', {}).get('name')),
+                        'genero': g_data[0].get('name') if g_data else "Desconocido",
+                        'anio': rd[:4] if rd else None,
+                        'imagen_url': d_ab.get('cover_xl') or d_ab.get('cover_big'),
+                        'disc_count': disc_count,
+                        'pistas': pistas
+                    }
+        except Exception as e:
+            print(f"Error Deezer (álbum): {e}")
+
+        print(f"⚠️ No se pudo resolver el álbum '{titulo_album}'. Se etiquetará pista por pista.")
+        return None
+
+    def _emparejar_pista(self, album_info: Dict, titulo: str, duracion: float = None) -> Optional[Dict]:
+        """Empareja localmente (sin red) un archivo con una pista del álbum por título y duración."""
+        if not Matcher.tokens(titulo or ''): return None
+
+        mejor, mejor_score = None, 0.0
+        for pista in album_info['pistas']:
+            sim = Matcher.similitud(titulo, pista['titulo'] or '')
+            if not sim: continue
+
+            if duracion and pista['duracion']:
+                diff = abs(duracion - pista['duracion'])
+                if diff > ALBUM_TOLERANCIA_DURACION: continue
+                sim -= diff / (ALBUM_TOLERANCIA_DURACION * 10)  # Desempate por duración
+
+            if sim > mejor_score:
+                mejor, mejor_score = pista, sim
+
+        return mejor if mejor_score >= 0.6 else None
+
+    async def _etiquetar_con_album_async(self, ruta_archivo: str, album_info: Dict, titulo_hint: str = None,
+                                         duracion: float = None, status_callback=None) -> Optional[Dict]:
+        titulo_local = titulo_hint or os.path.splitext(os.path.basename(ruta_archivo))[0]
+        pista = self._emparejar_pista(album_info, titulo_local, duracion)
+        if not pista:
+            print(f"⚠️ '{titulo_local}' no coincide con ninguna pista de '{album_info['album']}'")
+            return None
+
+        print(f"💿 Pista {pista['disc_number']}-{pista['track_number']}: {pista['titulo']} (sin consultas de red)")
+        letra = None
+        if ALBUM_BUSCAR_LETRAS:
+            letra = await self._buscar_letra_lrclib(pista['titulo'], pista['artista'], album_info['album'], duracion)
+
+        res = await self._guardar_y_renombrar(
+            ruta_archivo, True, status_callback, pista['titulo'], self._limpiar_artista(pista['artista']),
+            album_info['album'], album_info['genero'], pista['track_number'], pista['disc_number'],
+            album_info['disc_count'], album_info['imagen_url'], album_info['anio'], letra
+        )
+        if res: res['fuente_artista'] = 'album'
+        return res
+
+    async def _guardar_y_renombrar(self, ruta_archivo, datos_encontrados, status_callback, titulo, artista, album, genero, track_number, disc_number, disc_count, imagen_url, anio, letra, ids=None):
+        """Escribe los tags y renombra el archivo al título. Retorna el dict de resultado o None."""
         try:
             _, ext = os.path.splitext(ruta_archivo)
             ext = ext.lower()
             
             if letra: print(f"📝 Escribiendo letra ({len(letra)} bytes)...")
 
-            if ext == '.mp3':
-                self._guardar_mp3(ruta_archivo, titulo, artista, album, genero, track_number, disc_number, disc_count, imagen_url, anio, letra)
-            elif ext == '.opus':
-                self._guardar_opus(ruta_archivo, titulo, artista, album, genero, track_number, disc_number, disc_count, imagen_url, anio, letra)
+            # La escritura (y descarga de portada) es bloqueante: fuera del loop compartido
+            await asyncio.to_thread(self._guardar_tags, ruta_archivo, titulo, artista, album, genero, track_number, disc_number, disc_count, imagen_url, anio, letra)
             
             if datos_encontrados and titulo and titulo != "Desconocido":
                 directorio = os.path.dirname(ruta_archivo)
@@ -348,12 +816,12 @@ class MetadataService:
                              os.replace(ruta_archivo, nueva_ruta)
                              print(f"   ✨ Renombrado a: {nuevo_nombre}")
                              if status_callback: status_callback(f"✨ Renombrado: {nuevo_nombre}")
-                             return {'artist': artista, 'album': album, 'title': titulo, 'file_path': nueva_ruta}
+                             return {'artist': artista, 'album': album, 'title': titulo, 'file_path': nueva_ruta, 'ids': ids or {}}
                          else:
                              pass 
             
             if datos_encontrados:
-                 return {'artist': artista, 'album': album, 'title': titulo, 'file_path': ruta_archivo}
+                 return {'artist': artista, 'album': album, 'title': titulo, 'file_path': ruta_archivo, 'ids': ids or {}}
 
         except Exception as e:
             print(f"Error guardando tags/renombrando: {e}")
@@ -362,13 +830,49 @@ class MetadataService:
             
         return None
 
+    def datos_desde_ytdlp(self, info: Dict) -> Optional[Dict]:
+        """
+        Construye los tags a partir del info dict de yt-dlp. 'confiable' es True solo si la subida es
+        oficial (canal "Artista - Topic" / "Auto-generated by YouTube") y trae título, artista y álbum.
+        """
+        if not info: return None
+        titulo = info.get('track')
+        artistas = info.get('artists') or []
+        artista = ", ".join(artistas) if artistas else (info.get('artist') or info.get('creator'))
+        if not titulo or not artista:
+            return None
+
+        canal = info.get('channel') or info.get('uploader') or ''
+        oficial = canal.endswith(' - Topic') or 'Auto-generated by YouTube' in (info.get('description') or '')
+
+        anio = info.get('release_year') or (info.get('release_date') or '')[:4] or None
+        generos = info.get('genres') or []
+        return {
+            'titulo': titulo,
+            'artista': self._limpiar_artista(artista),
+            'album': info.get('album') or "Sencillo",
+            'genero': info.get('genre') or (generos[0] if generos else "Desconocido"),
+            'track_number': info.get('track_number'),
+            'disc_number': info.get('disc_number'),
+            'disc_count': None,
+            'imagen_url': self._miniatura_portada(info),
+            'anio': str(anio) if anio else None,
+            'letra': None,
+            'confiable': oficial and bool(info.get('album'))
+        }
+
+    @staticmethod
+    def _miniatura_portada(info: Dict) -> Optional[str]:
+        """Prefiere una miniatura cuadrada (arte del álbum); si no, la mayor disponible."""
+        miniaturas = [t for t in (info.get('thumbnails') or []) if t.get('url')]
+        cuadradas = [t for t in miniaturas if t.get('width') and t.get('width') == t.get('height')]
+        if cuadradas:
+            return max(cuadradas, key=lambda t: t['width'])['url']
+        return info.get('thumbnail')
+
     def _es_coincidencia_valida(self, original: str, encontrado: str) -> bool:
         if not original or not encontrado: return False
-        a = original.lower().strip()
-        b = encontrado.lower().strip()
-        if a in b or b in a: return True
-        from difflib import SequenceMatcher
-        return SequenceMatcher(None, a, b).ratio() > 0.4
+        return Matcher.similitud(original, encontrado) >= METADATA_UMBRAL_COINCIDENCIA
 
     def _es_artista_valido(self, query: str, artist_found: str, title_clean: str, strict: bool = False, artist_hint: str = None) -> bool:
         if not artist_found: return False # Simplificado para brevedad, lógica completa mantenida si fuera necesario
@@ -383,95 +887,49 @@ class MetadataService:
         temp_artist = re.sub(r'^[\s,&]+|[\s,&]+$', '', temp_artist).strip()
         return temp_artist or artista_str
 
-    def _guardar_mp3(self, ruta, titulo, artista, album, genero, track_number, disc_number, disc_count, imagen_url, anio, letra):
-        try:
+    def _guardar_tags(self, ruta, titulo, artista, album, genero, track_number, disc_number, disc_count, imagen_url, anio, letra):
+        """Obtiene la portada (caché) y escribe todos los tags en una sola pasada."""
+        portada = None
+        if imagen_url:
             try:
-                audio = EasyID3(ruta)
-            except ID3NoHeaderError:
-                audio = EasyID3()
-                audio.filename = ruta
-                audio.save()
-                audio = EasyID3(ruta)
-
-            audio['title'] = titulo
-            audio['artist'] = artista
-            audio['album'] = album
-            audio['genre'] = genero
-            if track_number: audio['tracknumber'] = str(track_number)
-            if disc_number: audio['discnumber'] = str(disc_number)
-            if anio:
-                audio['date'] = str(anio)
-                audio['originaldate'] = str(anio)
-            audio.save()
-
-            if imagen_url or track_number or disc_number or letra:
-                audio_full = ID3(ruta)
-                if imagen_url:
-                    try:
-                        img_data = requests.get(imagen_url).content
-                        audio_full.delall("APIC")
-                        audio_full.add(APIC(encoding=3, mime='image/jpeg', type=3, desc=u'Cover', data=img_data))
-                    except: pass
-                
-                if track_number: audio_full.add(TRCK(encoding=3, text=str(track_number)))
-                if disc_number:
-                    disk_text = str(disc_number)
-                    if disc_count: disk_text += f"/{disc_count}"
-                    audio_full.add(TPOS(encoding=3, text=disk_text))
-
-                if letra:
-                    audio_full.delall("USLT")
-                    audio_full.add(USLT(encoding=3, lang=u'eng', desc=u'', text=letra))
+                portada = self.portadas.obtener(imagen_url)
+            except Exception as e:
+                print(f"⚠️ Error obteniendo portada: {e}")
+        self.tag_writer.escribir(ruta, {
+            'titulo': titulo, 'artista': artista, 'album': album, 'genero': genero,
+            'track_number': track_number, 'disc_number': disc_number, 'disc_count': disc_count,
+            'anio': anio, 'letra': letra
+        }, portada)
+
+    async def _etiquetar_limitado(self, ruta_archivo: str, artista_hint: str = None, status_callback=None, strict_artist_match: bool = False, search_title: str = None, video_id: str = None, datos_previos: Dict = None):
+        if self._limite is None:
+            self._limite = asyncio.Semaphore(METADATA_CONCURRENCIA)
+        async with self._limite:
+            try:
+                return await self._etiquetar_async(ruta_archivo, artista_hint, status_callback, strict_artist_match, search_title, video_id, datos_previos)
+            except Exception as e:
+                print(f"Error fatal en etiquetar '{os.path.basename(ruta_archivo)}': {e}")
+                return None
 
-                audio_full.save(v2_version=3)
+    def etiquetar(self, ruta_archivo: str, artista_hint: str = None, status_callback=None, strict_artist_match: bool = False, search_title: str = None, video_id: str = None, datos_previos: Dict = None):
+        try:
+            return self._ejecutar(self._etiquetar_limitado(ruta_archivo, artista_hint, status_callback, strict_artist_match, search_title, video_id, datos_previos))
         except Exception as e:
-            print(f"Error guardando MP3 tags: {e}")
+            print(f"Error fatal en etiquetar: {e}")
+            return None
 
-    def _guardar_opus(self, ruta, titulo, artista, album, genero, track_number, disc_number, disc_count, imagen_url, anio, letra):
-        print(f"DEBUG: Guardando tags OPUS en {ruta} (Año: {anio})")
+    def resolver_album(self, titulo_album: str, artista: str = None) -> Optional[Dict]:
         try:
-            try:
-                audio = OggOpus(ruta)
-            except Exception as e:
-                print(f"⚠️ Error cargando OggOpus (intentando crear): {e}")
-                return 
-
-            audio['TITLE'] = titulo
-            audio['ARTIST'] = artista
-            audio['ALBUM'] = album
-            audio['GENRE'] = genero
-            if track_number: audio['TRACKNUMBER'] = str(track_number)
-            if disc_number: audio['DISCNUMBER'] = str(disc_number)
-            if disc_count: audio['DISCTOTAL'] = str(disc_count)
-            if anio:
-                 audio['DATE'] = str(anio)
-                 audio['YEAR'] = str(anio)
-            
-            if letra:
-                 audio['LYRICS'] = letra
-
-            if imagen_url:
-                try:
-                    img_data = requests.get(imagen_url, timeout=5).content
-                    p = Picture()
-                    p.data = img_data
-                    p.type = 3
-                    p.mime = "image/jpeg"
-                    p.desc = "Cover"
-                    audio["metadata_block_picture"] = [base64.b64encode(p.write()).decode("ascii")]
-                except Exception as img_err:
-                     print(f"⚠️ Error guardando imagen OPUS: {img_err}")
-            
-            audio.save()
-            print("DEBUG: Tags OPUS guardados correctamente.")
+            return self._ejecutar(self._resolver_album_async(titulo_album, artista))
         except Exception as e:
-            print(f"❌ Error CRÍTICO guardando OPUS tags: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"Error resolviendo álbum: {e}")
+            return None
 
-    def etiquetar(self, ruta_archivo: str, artista_hint: str = None, status_callback=None, strict_artist_match: bool = False, search_title: str = None):
+    def etiquetar_con_album(self, ruta_archivo: str, album_info: Dict, titulo_hint: str = None,
+                            duracion: float = None, status_callback=None) -> Optional[Dict]:
+        """Etiqueta contra un tracklist ya resuelto. Retorna None si no hay pista que coincida."""
         try:
-            return asyncio.run(self._etiquetar_async(ruta_archivo, artista_hint, status_callback, strict_artist_match, search_title))
+            return self._ejecutar(self._etiquetar_con_album_async(ruta_archivo, album_info, titulo_hint, duracion, status_callback))
         except Exception as e:
-            print(f"Error fatal en etiquetar: {e}")
+            print(f"Error etiquetando con álbum: {e}")
             return None
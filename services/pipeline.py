@@ -0,0 +1,79 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, List
+
+_FIN = object()
+
+
+class Etapa:
+    """Una etapa del pipeline: N hilos que consumen de una cola acotada."""
+
+    def __init__(self, nombre: str, funcion: Callable[[Any], Any], hilos: int, capacidad: int):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.hilos = max(1, hilos)
+        self.cola = queue.Queue(maxsize=max(1, capacidad))
+        self.activos = 0
+        self._lock = threading.Lock()
+
+
+class Pipeline:
+    """
+    Etapas encadenadas por colas acotadas (backpressure): cuando una etapa se atrasa,
+    su cola se llena y la anterior se bloquea en vez de acumular trabajo en memoria.
+    Cada etapa recibe el resultado de la anterior; si retorna None el trabajo se descarta.
+    """
+
+    def __init__(self):
+        self.etapas: List[Etapa] = []
+        self._lock = threading.Lock()
+
+    def etapa(self, nombre: str, funcion: Callable[[Any], Any], hilos: int = 1, capacidad: int = 4) -> 'Pipeline':
+        self.etapas.append(Etapa(nombre, funcion, hilos, capacidad))
+        return self
+
+    def _trabajador(self, indice: int, resultados: List[Any]) -> None:
+        etapa = self.etapas[indice]
+        siguiente = self.etapas[indice + 1] if indice + 1 < len(self.etapas) else None
+        while True:
+            trabajo = etapa.cola.get()
+            if trabajo is _FIN:
+                break
+            with etapa._lock: etapa.activos += 1
+            try:
+                resultado = etapa.funcion(trabajo)
+            except Exception as e:
+                print(f"❌ Error en etapa '{etapa.nombre}': {e}")
+                resultado = None
+            finally:
+                with etapa._lock: etapa.activos -= 1
+            if resultado is None:
+                continue
+            if siguiente:
+                siguiente.cola.put(resultado)
+            else:
+                with self._lock: resultados.append(resultado)
+
+    def ejecutar(self, trabajos: Iterable[Any]) -> List[Any]:
+        """
+        Procesa todos los trabajos y retorna los resultados de la última etapa (en orden de llegada).
+        Se puede llamar varias veces; cada llamada retorna solo los resultados de esa ejecución.
+        """
+        resultados: List[Any] = []
+        hilos_por_etapa = []
+        for indice, etapa in enumerate(self.etapas):
+            hilos = [threading.Thread(target=self._trabajador, args=(indice, resultados), daemon=True,
+                                      name=f"{etapa.nombre}-{n}") for n in range(etapa.hilos)]
+            for hilo in hilos: hilo.start()
+            hilos_por_etapa.append(hilos)
+
+        primera = self.etapas[0]
+        for trabajo in trabajos:
+            primera.cola.put(trabajo)
+
+        # Cierre en cascada: cuando todos los hilos de una etapa terminan, se cierra la siguiente
+        for etapa, hilos in zip(self.etapas, hilos_por_etapa):
+            for _ in hilos: etapa.cola.put(_FIN)
+            for hilo in hilos: hilo.join()
+        return resultados
+
@@ -1,145 +1,358 @@
 import os
+import re
+import threading
 from collections import Counter
-from typing import List, Dict, Callable
+from typing import List, Dict, Callable, Optional, Tuple
 from services.youtube_service import YouTubeService
 from services.metadata_service import MetadataService
+from services.transcode_service import TranscodeService
+from services.pipeline import Pipeline
+from services.concurrencia import ControlConcurrencia
+from services.job_store import JobStore
+from services.library_index import LibraryIndex
+from services.progreso import ProgresoLote
+from config.settings import (PIPELINE_ETAPAS, CONCURRENCIA_DESCARGAS, CONSENSO_PROPORCION, CONSENSO_MIN_PISTAS,
+                             METADATA_CONCURRENCIA)
 
 class PlaylistService:
     """Maneja descargas en lote y verificacion de consistencia de playlists."""
 
-    def __init__(self, youtube_service: YouTubeService, metadata_service: MetadataService):
+    def __init__(self, youtube_service: YouTubeService, metadata_service: MetadataService,
+                 transcode_service: Optional[TranscodeService] = None, job_store: Optional[JobStore] = None,
+                 library_index: Optional[LibraryIndex] = None):
         self.youtube_service = youtube_service
         self.metadata_service = metadata_service
+        self.transcode_service = transcode_service
+        self.job_store = job_store
+        self.library_index = library_index
 
     def procesar_batch(self, url: str, items: List[Dict], tipo: str, formato_id: str, 
                       audio_format: str, directorio: str, contenedor: str, 
-                      progress_callback: Callable, status_callback: Callable) -> None:
-        
-        import concurrent.futures
-        import threading
-        
-        tagging_results = []
+                      progress_callback: Callable, status_callback: Callable,
+                      playlist_title: str = None, playlist_uploader: str = None,
+                      sincronizar: bool = False, stats_callback: Callable = None) -> List[Dict]:
+        """
+        stats_callback recibe el estado agregado del lote (hechos/fallidos/activos, bytes/s, ETA),
+        a lo sumo PROGRESO_FRECUENCIA_HZ veces por segundo.
+        Los items que fallan se reintentan una vez al final del lote. Retorna los que fallaron
+        igualmente: [{'title', 'motivo'}].
+        """
+        formato = audio_format if tipo == 'musica' else contenedor
+
+        # Modo sincronización: solo lo que no está ya en la biblioteca (en este formato y en disco)
+        if sincronizar and self.library_index:
+            ya_descargados = self.library_index.existentes((self._id_item(i) for i in items), formato)
+            nuevos = [i for i in items if self._id_item(i) not in ya_descargados]
+            print(f"🔁 Sincronizando: {len(nuevos)} nuevos de {len(items)}")
+            if status_callback: status_callback(f"🔁 {len(nuevos)} nuevos de {len(items)}")
+            items = nuevos
+            if not items:
+                if progress_callback: progress_callback(100)
+                return []
+
         total = len(items)
-        progress_map = {}
-        progress_lock = threading.Lock()
-        
-        # Inicializar mapa de progreso
-        for i in range(total): progress_map[i] = 0.0
-
-        def update_individual_progress(idx, percent):
-            with progress_lock:
-                progress_map[idx] = percent
-                # Calcular promedio total
-                total_percent = sum(progress_map.values()) / total
-                if progress_callback: progress_callback(total_percent)
-
-        def procesar_item_wrapper(args):
-            i, item = args
-            target_title = item.get('title', f"Video {i+1}")
-            
-            # Pequeña pausa aleatoria al inicio para evitar requests simultáneos exactos
-            import time, random
-            time.sleep(random.uniform(0.5, 2.0))
+        # Las descargas simultáneas las decide el control adaptativo (no un número fijo)
+        control = ControlConcurrencia(**CONCURRENCIA_DESCARGAS)
+
+        def reportar(stats):
+            if stats_callback: stats_callback(dict(stats, concurrencia=control.limite))
+
+        progreso = ProgresoLote(total, progress_callback, reportar)
+
+        # Modo Álbum: un solo tracklist para todo el lote en vez de Shazam + búsquedas por pista
+        album_info = None
+        if tipo == 'musica':
+            album = self._detectar_album(url, items, playlist_title, playlist_uploader)
+            if album:
+                if status_callback: status_callback(f"💿 Resolviendo álbum: {album[0][:25]}...")
+                album_info = self.metadata_service.resolver_album(*album)
+
+        # La conversión ffmpeg es una etapa propia: los hilos de descarga no esperan al CPU
+        transcodificar = (tipo == 'musica' and self.transcode_service is not None
+                          and self.youtube_service._ffmpeg_disponible())
+
+        # Registro persistente: si este mismo lote quedó a medias, se retoma donde quedó
+        parametros = {'tipo': tipo, 'formato_id': formato_id, 'audio_format': audio_format, 'directorio': directorio,
+                      'contenedor': contenedor, 'playlist_title': playlist_title, 'playlist_uploader': playlist_uploader}
+        lote_id, guardados = self.job_store.abrir_lote(url, items, parametros) if self.job_store else (None, {})
+        final = JobStore.estado_final(parametros)
+
+        def registrar(trabajo, ruta, tags=None):
+            if self.library_index:
+                video_id = (trabajo.get('info') or {}).get('id') or self._id_item(trabajo['item'])
+                self.library_index.registrar(video_id, formato, ruta, tags)
+
+        def marcar(trabajo, estado, **campos):
+            trabajo['estado'] = estado
+            if estado == JobStore.FALLIDO:
+                trabajo['intentos'] += 1
+                trabajo['motivo'] = campos.get('motivo')
+            # Un fallo con intentos por delante no cierra el item: se reintenta al final
+            if estado == final or (estado == JobStore.FALLIDO and trabajo['intentos'] >= JobStore.MAX_INTENTOS):
+                progreso.terminar(trabajo['indice'], estado == final)
+            if self.job_store: self.job_store.marcar(lote_id, trabajo['indice'], estado, **campos)
+
+        previos, trabajos, agotados = [], [], []
+        for i, item in enumerate(items):
+            guardado = guardados.get(i) or {}
+            estado = guardado.get('estado', JobStore.EN_COLA)
+            if estado == final:
+                progreso.saltar(i)
+                if guardado.get('resultado'): previos.append(guardado['resultado'])
+                continue
+            if guardado.get('agotado'):
+                # Ya falló con reintento incluido (privado, borrado...): no se vuelve a intentar
+                progreso.saltar(i, exito=False)
+                agotados.append({'title': item.get('title'), 'motivo': guardado.get('motivo')})
+                continue
+            trabajo = {'indice': i, 'item': item, 'estado': JobStore.EN_COLA,
+                       'intentos': guardado.get('intentos', 0)}
+            # Lo ya descargado/convertido se reaprovecha si el archivo sigue ahí
+            if (estado in (JobStore.DESCARGADO, JobStore.CONVERTIDO) and guardado.get('info')
+                    and guardado.get('ruta') and os.path.exists(guardado['ruta'])):
+                trabajo.update(estado=estado, ruta=guardado['ruta'], info=guardado['info'])
+            trabajos.append(trabajo)
+        if previos or len(trabajos) < total:
+            print(f"♻️ Retomando lote: {total - len(trabajos)}/{total} items ya completos")
+            if status_callback: status_callback(f"♻️ Retomando: {total - len(trabajos)}/{total} ya completos")
+
+        # --- Etapas: cada una recibe el trabajo de la anterior; None lo descarta ---
+        def extraer(trabajo):
+            if trabajo['estado'] != JobStore.EN_COLA: return trabajo
+            trabajo['info'] = self.youtube_service.extraer_info(trabajo['item'].get('url'))
+            if trabajo['info'] is None and self.youtube_service.es_limitacion(self.youtube_service.ultimo_error()):
+                control.registrar_limitacion()
+            return trabajo
+
+        def descargar(trabajo):
+            if trabajo['estado'] != JobStore.EN_COLA: return trabajo
+            i = trabajo['indice']
+            control.adquirir()
+            progreso.iniciar(i)
+            ruta_archivo = None
+
+            def hook(d):
+                if d['status'] == 'downloading':
+                    progreso.actualizar(i, YouTubeService.porcentaje_progreso(d), d.get('downloaded_bytes'))
+                elif d['status'] == 'finished':
+                    progreso.actualizar(i, 100.0, d.get('downloaded_bytes') or d.get('total_bytes'))
 
             try:
-                def local_cb(p):
-                    update_individual_progress(i, p)
-                
-                # Para evitar conflictos en la UI con mensajes simultáneos, 
-                # simplificamos el status_callback dentro de los hilos o usamos uno compartido con cuidado.
-                # Aquí lo pasamos tal cual, sabiendo que puede haber condiciones de carrera en el texto de la UI.
-                
-                return self._procesar_un_item(
-                    item, tipo, formato_id, audio_format, directorio, contenedor,
-                    local_cb, status_callback
+                ruta_archivo, info = self._descargar_item(
+                    trabajo['item'], tipo, formato_id, audio_format, directorio, contenedor,
+                    None, status_callback, convertir_audio=not transcodificar, hook_callback=hook
                 )
-            except Exception as e:
-                print(f"❌ Error thread {i}: {e}")
+            finally:
+                limitado = not ruta_archivo and self.youtube_service.es_limitacion(self.youtube_service.ultimo_error())
+                tamaño = os.path.getsize(ruta_archivo) if ruta_archivo and os.path.exists(ruta_archivo) else 0
+                control.liberar(bool(ruta_archivo), tamaño, limitado)
+            if not ruta_archivo:
+                marcar(trabajo, JobStore.FALLIDO, motivo=self.youtube_service.ultimo_error() or "descarga fallida")
                 return None
+            trabajo.update(ruta=ruta_archivo, info=info)
+            marcar(trabajo, JobStore.DESCARGADO, ruta=ruta_archivo, info=info)
+            if tipo != 'musica':
+                registrar(trabajo, ruta_archivo)
+            return trabajo
 
-        # Ejecutar en paralelo (max 2 workers)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            # Preparamos argumentos
-            work_args = [(i, item) for i, item in enumerate(items)]
-            
-            # Submit all
-            future_to_item = {executor.submit(procesar_item_wrapper, arg): arg for arg in work_args}
-            
-            for future in concurrent.futures.as_completed(future_to_item):
-                res = future.result()
-                if res:
-                    tagging_results.append(res)
-
-        # --- ANÁLISIS RETROSPECTIVO ---
-        if tipo == 'musica' and len(tagging_results) > 1:
-             self._analizar_consistencia(tagging_results, status_callback)
-
-    def _procesar_un_item(self, item: Dict, tipo: str, formato_id: str, 
-                          audio_format: str, directorio: str, contenedor: str, 
-                          progress_callback: Callable, status_callback: Callable) -> Dict:
-        
+        def convertir(trabajo):
+            if trabajo['estado'] == JobStore.CONVERTIDO: return trabajo
+            ruta = self.transcode_service.convertir(trabajo['ruta'], audio_format, trabajo['info'].get('acodec'))
+            if not ruta:
+                if status_callback: status_callback(f"⚠️ Error convirtiendo {trabajo['item'].get('title', 'Video')[:15]}...")
+                marcar(trabajo, JobStore.FALLIDO, motivo="conversión fallida")
+                return None
+            trabajo['ruta'] = ruta
+            marcar(trabajo, JobStore.CONVERTIDO, ruta=ruta)
+            return trabajo
+
+        # Consenso de artista en vivo: en cuanto es claro, las pistas siguientes se buscan ya
+        # en modo estricto con el artista dominante (en vez de re-etiquetarlas al final)
+        conteo_artistas, consenso_lock = Counter(), threading.Lock()
+        etiquetados = [0]
+
+        def contar(res):
+            if not res: return
+            with consenso_lock:
+                etiquetados[0] += 1
+                if res.get('artist') and res['artist'] != "Desconocido":
+                    conteo_artistas[res['artist']] += 1
+
+        def dominante(minimo=CONSENSO_MIN_PISTAS):
+            with consenso_lock:
+                return self._artista_dominante(conteo_artistas, etiquetados[0], minimo)
+
+        for res in previos: contar(res)
+
+        def etiquetar(trabajo):
+            artista = dominante()
+            res = self._etiquetar_item(trabajo['item'], trabajo['ruta'], trabajo['info'], album_info, status_callback,
+                                       artista_hint=artista, estricto=bool(artista))
+            if res: res['antes_consenso'] = artista is None
+            contar(res)
+            # Sin coincidencias no es un fallo del lote: el archivo está listo, solo sin metadatos externos
+            marcar(trabajo, JobStore.ETIQUETADO, ruta=res['file_path'] if res else None, resultado=res,
+                   motivo=None if res else "sin coincidencias")
+            registrar(trabajo, res['file_path'] if res else trabajo['ruta'], res)
+            return res
+
+        pipeline = Pipeline()
+        self._agregar_etapa(pipeline, 'extraer', extraer)
+        self._agregar_etapa(pipeline, 'descargar', descargar, hilos=control.maximo)
+        if transcodificar:
+            self._agregar_etapa(pipeline, 'convertir', convertir, hilos=self.transcode_service.max_procesos)
+        if tipo == 'musica':
+            # Cada hilo espera su archivo en el loop compartido de metadatos, que limita a METADATA_CONCURRENCIA
+            self._agregar_etapa(pipeline, 'etiquetar', etiquetar, hilos=METADATA_CONCURRENCIA)
+
+        resultados = pipeline.ejecutar(trabajos)
+
+        reintentos = [t for t in trabajos if t['estado'] == JobStore.FALLIDO and t['intentos'] < JobStore.MAX_INTENTOS]
+        if reintentos:
+            print(f"🔁 Reintentando {len(reintentos)} items fallidos...")
+            if status_callback: status_callback(f"🔁 Reintentando {len(reintentos)} fallidos...")
+            for trabajo in reintentos: trabajo['estado'] = JobStore.EN_COLA
+            resultados += pipeline.ejecutar(reintentos)
+
+        if self.job_store: self.job_store.cerrar_lote(lote_id)
+        fallidos = agotados + [{'title': t['item'].get('title'), 'motivo': t.get('motivo')}
+                               for t in trabajos if t['estado'] == JobStore.FALLIDO]
+        if fallidos:
+            print(f"⚠️ {len(fallidos)} items no se pudieron completar:")
+            for f in fallidos: print(f"   - {f['title']}: {f['motivo']}")
+
+        # Lo etiquetado por búsqueda libre antes de que hubiera consenso: solo se reescribe el tag de artista
+        tagging_results = previos + [res for res in resultados if res] if tipo == 'musica' else []
+        artista = dominante(minimo=2) if len(tagging_results) > 1 else None
+        if artista:
+            corregidos = self._corregir_impostores(tagging_results, artista, status_callback)
+            if self.library_index:
+                for video_id, res in corregidos:
+                    self.library_index.registrar(video_id, formato, res.get('file_path'), res)
+        return fallidos
+
+    @staticmethod
+    def _id_item(item: Dict) -> Optional[str]:
+        return item.get('id') or YouTubeService._id_video(item.get('url'))
+
+    @staticmethod
+    def _agregar_etapa(pipeline: Pipeline, nombre: str, funcion: Callable, hilos: int = None) -> None:
+        config = PIPELINE_ETAPAS.get(nombre, {})
+        pipeline.etapa(nombre, funcion, hilos=config.get('hilos') or hilos or 1, capacidad=config.get('cola', 4))
+
+    def _descargar_item(self, item: Dict, tipo: str, formato_id: str,
+                        audio_format: str, directorio: str, contenedor: str,
+                        progress_callback: Callable, status_callback: Callable,
+                        convertir_audio: bool = True,
+                        hook_callback: Callable = None) -> Tuple[Optional[str], Optional[Dict]]:
         target_url = item.get('url')
         target_title = item.get('title', "Video")
         
-        if not target_url: return None
+        if not target_url: return None, None
 
         try:
-            # 1. Descargar
+            # Con hook_callback el progreso lo agrega el llamador: el status por hook sería ruido
             ruta_archivo, info = self.youtube_service.descargar(
-                target_url, tipo, formato_id, audio_format, directorio, contenedor, 
-                progress_callback, status_callback
+                target_url, tipo, formato_id, audio_format, directorio, contenedor,
+                progress_callback, None if hook_callback else status_callback,
+                convertir_audio=convertir_audio, hook_callback=hook_callback
             )
+            if ruta_archivo and os.path.exists(ruta_archivo):
+                return ruta_archivo, info
+
+            print(f"⚠️ Error descarga: '{target_title}'. Saltando item.")
+            if status_callback: status_callback(f"⚠️ Saltando {target_title[:15]}...")
+        except Exception as e:
+            print(f"❌ Error procesando '{target_title}': {e}")
+            if status_callback: status_callback(f"⚠️ Error en {target_title[:15]}...")
+        return None, None
+
+    def _etiquetar_item(self, item: Dict, ruta_archivo: str, info: Dict, album_info: Optional[Dict],
+                        status_callback: Callable, artista_hint: str = None,
+                        estricto: bool = False) -> Optional[Dict]:
+        target_title = item.get('title', "Video")
 
-            if ruta_archivo and os.path.exists(ruta_archivo) and tipo == 'musica':
-                    # 2. Etiquetar individualmente
-                    if status_callback: status_callback(f"🏷️ Etiquetando: {target_title[:15]}...")
-                    
-                    artist_hint = info.get('uploader') or info.get('artist') or info.get('channel')
-                    
-                    # Etiquetar
-                    res = self.metadata_service.etiquetar(ruta_archivo, artista_hint=artist_hint, status_callback=None)
-                    
-                    if res and isinstance(res, dict) and 'artist' in res:
-                        res['original_entry'] = item 
-                        res['file_path'] = res.get('file_path', ruta_archivo) # Asegurar path
-                        return res
-
-            elif not ruta_archivo:
-                    print(f"⚠️ Error descarga: '{target_title}'. Saltando item.")
-                    if status_callback: status_callback(f"⚠️ Saltando {target_title[:15]}...")
+        try:
+            # 2. Etiquetar individualmente
+            if status_callback: status_callback(f"🏷️ Etiquetando: {target_title[:15]}...")
+            
+            artist_hint = artista_hint or info.get('uploader') or info.get('artist') or info.get('channel')
+            
+            # Etiquetar (primero contra el tracklist del álbum, si se resolvió)
+            res = None
+            if album_info:
+                res = self.metadata_service.etiquetar_con_album(
+                    ruta_archivo, album_info, titulo_hint=info.get('track') or info.get('title'),
+                    duracion=info.get('duration')
+                )
+            if not res:
+                res = self.metadata_service.etiquetar(ruta_archivo, artista_hint=artist_hint, status_callback=None,
+                                                      strict_artist_match=estricto, video_id=info.get('id'),
+                                                      datos_previos=self.metadata_service.datos_desde_ytdlp(info))
+            
+            if res and isinstance(res, dict) and 'artist' in res:
+                res['original_entry'] = item 
+                res['video_id'] = info.get('id')
+                res['file_path'] = res.get('file_path', ruta_archivo) # Asegurar path
+                return res
         
         except Exception as e:
             print(f"❌ Error procesando '{target_title}': {e}")
             if status_callback: status_callback(f"⚠️ Error en {target_title[:15]}...")
             
         return None
-    def _analizar_consistencia(self, tagging_results: List[Dict], status_callback: Callable):
-         print(f"📊 Analizando consistencia de playlist ({len(tagging_results)} procesadas)...")
-         
-         found_artists = [res['artist'] for res in tagging_results if res.get('artist') and res['artist'] != "Desconocido"]
-         
-         if found_artists:
-             most_common_found = Counter(found_artists).most_common(1)
-             if most_common_found:
-                 dominant_artist = most_common_found[0][0]
-                 count = most_common_found[0][1]
-                 total_tags = len(tagging_results)
-                 
-                 # 60% Consenso
-                 if count >= total_tags * 0.6: 
-                     print(f"⚖️ Consenso de Playlist detectado: '{dominant_artist}' ({count}/{total_tags})")
-                     
-                     for res in tagging_results:
-                         current_artist = res.get('artist')
-                         is_imposter = False
-                         if current_artist and current_artist != dominant_artist:
-                             # Validar que no contenga al dominante (ej: Feat)
-                             if dominant_artist.lower() not in current_artist.lower():
-                                 is_imposter = True
-                         
-                         if is_imposter:
-                             print(f"🕵️ 'Impostor' detectado: '{current_artist}' en '{os.path.basename(res['file_path'])}'. Corrigiendo con '{dominant_artist}'...")
-                             if status_callback: status_callback(f"🔄 Corrigiendo: {dominant_artist}")
-                             
-                             orig_title = res.get('original_entry', {}).get('title')
-                             self.metadata_service.etiquetar(res['file_path'], artista_hint=dominant_artist, status_callback=None, strict_artist_match=True, search_title=orig_title)
+
+    def _detectar_album(self, url: str, items: List[Dict], playlist_title: str = None,
+                        playlist_uploader: str = None) -> Optional[Tuple[str, str]]:
+        """Detecta si el lote es un álbum de YouTube Music. Retorna (titulo_album, artista) o None."""
+        es_album = 'list=OLAK5uy_' in (url or '') or (playlist_title or '').startswith('Album - ')
+        if not es_album or not playlist_title:
+            return None
+
+        titulo_album = re.sub(r'^Album\s*-\s*', '', playlist_title).strip()
+
+        # El artista sale del canal "Artista - Topic" dominante entre las pistas
+        uploaders = [i.get('uploader') for i in items if i.get('uploader') and i.get('uploader') != "Varios"]
+        artista = Counter(uploaders).most_common(1)[0][0] if uploaders else playlist_uploader
+        if artista == "Varios": artista = None
+        if artista: artista = re.sub(r'\s*-\s*Topic$', '', artista).strip()
+
+        print(f"💿 Playlist de álbum detectada: '{titulo_album}' ({artista or 'artista desconocido'})")
+        return titulo_album, artista
+
+    @staticmethod
+    def _artista_dominante(conteo: Counter, total: int, minimo: int) -> Optional[str]:
+        """Artista con al menos CONSENSO_PROPORCION de las pistas etiquetadas (y 'minimo' apariciones)."""
+        if not conteo: return None
+        artista, cantidad = conteo.most_common(1)[0]
+        if cantidad >= minimo and cantidad >= total * CONSENSO_PROPORCION:
+            return artista
+        return None
+
+    @staticmethod
+    def _es_impostor(artista: Optional[str], dominante: str) -> bool:
+        # Un artista que contiene al dominante (ej: feat.) no es un impostor
+        return bool(artista) and artista != dominante and dominante.lower() not in artista.lower()
+
+    def _corregir_impostores(self, tagging_results: List[Dict], dominant_artist: str,
+                             status_callback: Callable) -> List[Tuple[str, Dict]]:
+        """
+        Reescribe solo el tag de artista de los 'impostores' (sin Shazam ni búsquedas, sin renombrar).
+        Solo se tocan pistas etiquetadas antes del consenso cuyo artista salió de la búsqueda de texto:
+        una identificación de Shazam o de yt-dlp (ej: una colaboración real) se respeta.
+        Retorna [(video_id, resultado)] de lo corregido.
+        """
+        print(f"⚖️ Consenso de Playlist: '{dominant_artist}' ({len(tagging_results)} procesadas)")
+        corregidos = []
+        for res in tagging_results:
+            if not (res.get('antes_consenso') and res.get('fuente_artista') == 'busqueda'):
+                continue
+            if not self._es_impostor(res.get('artist'), dominant_artist):
+                continue
+            ruta = res.get('file_path')
+            print(f"🕵️ 'Impostor' detectado: '{res.get('artist')}' en '{os.path.basename(ruta or '')}'. Corrigiendo con '{dominant_artist}'...")
+            if status_callback: status_callback(f"🔄 Corrigiendo: {dominant_artist}")
+            if ruta and os.path.exists(ruta) and self.metadata_service.tag_writer.escribir(ruta, {'artista': dominant_artist}):
+                res['artist'] = dominant_artist
+                if res.get('video_id'): corregidos.append((res['video_id'], res))
+        return corregidos
@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from config.settings import PROGRESO_FRECUENCIA_HZ
+
+
+class ProgresoLote:
+    """
+    Progreso agregado de un lote. Cada evento cuesta O(1) (se mantiene la suma acumulada en vez
+    de recorrer todos los items) y los avisos a la UI se agrupan a PROGRESO_FRECUENCIA_HZ como máximo;
+    los cambios de estado de un item (terminado/fallido) siempre se envían.
+    """
+
+    def __init__(self, total: int, progress_callback: Optional[Callable] = None,
+                 stats_callback: Optional[Callable] = None, frecuencia: float = PROGRESO_FRECUENCIA_HZ):
+        self.total = max(1, total)
+        self.progress_callback = progress_callback
+        self.stats_callback = stats_callback
+        self._intervalo = 1.0 / frecuencia if frecuencia else 0.0
+        self._lock = threading.Lock()
+
+        self._porcentajes = [0.0] * total
+        self._suma = 0.0
+        self._bytes_item: Dict[int, int] = {}  # Solo items activos
+        self._bytes_total = 0
+
+        self.completados = 0
+        self.fallidos = 0
+        self._saltados = 0  # Completos de una ejecución anterior: no cuentan para la ETA
+        self._activos = set()
+
+        self._inicio = time.monotonic()
+        self._ultimo_envio = 0.0
+        self._bytes_envio = 0
+        self._t_envio = self._inicio
+        self._velocidad = 0.0
+
+    def iniciar(self, indice: int) -> None:
+        with self._lock:
+            self._activos.add(indice)
+        self._emitir(forzar=True)
+
+    def actualizar(self, indice: int, porcentaje: float, bytes_descargados: Optional[int] = None) -> None:
+        with self._lock:
+            porcentaje = min(max(porcentaje, 0.0), 100.0)
+            self._suma += porcentaje - self._porcentajes[indice]
+            self._porcentajes[indice] = porcentaje
+            if bytes_descargados is not None:
+                anterior = self._bytes_item.get(indice, 0)
+                # Un reintento reinicia el contador: se toma como nueva base
+                self._bytes_total += bytes_descargados - anterior if bytes_descargados >= anterior else bytes_descargados
+                self._bytes_item[indice] = bytes_descargados
+        self._emitir()
+
+    def terminar(self, indice: int, exito: bool) -> None:
+        with self._lock:
+            self._activos.discard(indice)
+            self._bytes_item.pop(indice, None)
+            if exito: self.completados += 1
+            else: self.fallidos += 1
+            self._suma += 100.0 - self._porcentajes[indice]
+            self._porcentajes[indice] = 100.0
+        self._emitir(forzar=True)
+
+    def saltar(self, indice: int, exito: bool = True) -> None:
+        """Item ya resuelto de antes (lote retomado): cuenta como hecho o fallido sin haber estado activo."""
+        with self._lock:
+            if exito: self.completados += 1
+            else: self.fallidos += 1
+            self._saltados += 1
+            self._suma += 100.0 - self._porcentajes[indice]
+            self._porcentajes[indice] = 100.0
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            return self._estadisticas()
+
+    def _estadisticas(self) -> Dict:
+        porcentaje = self._suma / self.total
+        transcurrido = time.monotonic() - self._inicio
+        # La ETA sale solo del avance de esta ejecución (sin los items saltados)
+        base = self._saltados * 100.0
+        pendiente = self.total * 100.0 - base
+        avance = (self._suma - base) / pendiente if pendiente > 0 else 1.0
+        eta = None
+        if 0 < avance < 1:
+            eta = transcurrido * (1 - avance) / avance
+        return {
+            'porcentaje': porcentaje,
+            'total': self.total,
+            'completados': self.completados,
+            'fallidos': self.fallidos,
+            'activos': len(self._activos),
+            'bytes_por_segundo': self._velocidad,
+            'eta': eta,
+        }
+
+    def _emitir(self, forzar: bool = False) -> None:
+        with self._lock:
+            ahora = time.monotonic()
+            if not forzar and ahora - self._ultimo_envio < self._intervalo:
+                return
+            self._ultimo_envio = ahora
+            # Velocidad agregada suavizada entre envíos
+            dt = ahora - self._t_envio
+            if dt >= 0.2:
+                instantanea = (self._bytes_total - self._bytes_envio) / dt
+                self._velocidad = instantanea if not self._velocidad else 0.7 * self._velocidad + 0.3 * instantanea
+                self._bytes_envio, self._t_envio = self._bytes_total, ahora
+            stats = self._estadisticas()
+
+        if self.progress_callback: self.progress_callback(stats['porcentaje'])
+        if self.stats_callback: self.stats_callback(stats)
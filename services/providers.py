@@ -0,0 +1,159 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from config.settings import PROVEEDORES
+
+
+class ProveedorNoDisponible(Exception):
+    """El circuito del proveedor está abierto: se salta sin hacer la petición."""
+
+
+class LimitadorTasa:
+    """Cubo de tokens. Pensado para usarse desde un único event loop (sin locks)."""
+
+    def __init__(self, tasa: float, rafaga: int):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self._tokens = float(rafaga)
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+
+    def _recargar(self) -> None:
+        ahora = time.monotonic()
+        self._tokens = min(self.rafaga, self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    async def adquirir(self) -> None:
+        while True:
+            ahora = time.monotonic()
+            if ahora < self._pausa_hasta:
+                await asyncio.sleep(self._pausa_hasta - ahora)
+                continue
+            self._recargar()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.tasa)
+
+    def pausar(self, segundos: float) -> None:
+        """Detiene a todos los que esperan (p. ej. por un Retry-After)."""
+        self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+
+
+class CircuitBreaker:
+    """
+    Tras N fallos seguidos se abre durante el enfriamiento. Después queda semiabierto: deja pasar
+    una sola petición de prueba (el resto se rechaza); si sale bien se cierra, si falla se reabre.
+    Como el limitador, se usa desde un único event loop (sin locks).
+    """
+
+    def __init__(self, umbral_fallos: int, enfriamiento: float):
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento = enfriamiento
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+        self._semiabierto = False
+        self._prueba_desde: Optional[float] = None  # Prueba en curso (semiabierto)
+
+    @property
+    def abierto(self) -> bool:
+        return time.monotonic() < self._abierto_hasta
+
+    def permitir(self) -> bool:
+        if self.abierto:
+            return False
+        if not self._semiabierto:
+            return True
+        # Una prueba a la vez; si la anterior no informó resultado (p. ej. cancelada) se admite otra
+        ahora = time.monotonic()
+        if self._prueba_desde is not None and ahora - self._prueba_desde < self.enfriamiento:
+            return False
+        self._prueba_desde = ahora
+        return True
+
+    def registrar_exito(self) -> None:
+        self._fallos = 0
+        self._semiabierto = False
+        self._prueba_desde = None
+
+    def registrar_fallo(self) -> bool:
+        """Retorna True si este fallo abrió el circuito."""
+        if self.abierto:
+            return False  # Petición que ya estaba en curso al abrirse
+        self._fallos += 1
+        if self._semiabierto or self._fallos >= self.umbral_fallos:
+            self._abierto_hasta = time.monotonic() + self.enfriamiento
+            self._fallos = 0
+            self._semiabierto = True
+            self._prueba_desde = None
+            return True
+        return False
+
+
+class Proveedor:
+    """Envuelve las llamadas a un proveedor externo con límite de tasa, reintentos y circuit breaker."""
+
+    def __init__(self, nombre: str, tasa: float, rafaga: int, reintentos: int,
+                 umbral_fallos: int, enfriamiento: float):
+        self.nombre = nombre
+        self.reintentos = reintentos
+        self.limitador = LimitadorTasa(tasa, rafaga)
+        self.circuito = CircuitBreaker(umbral_fallos, enfriamiento)
+
+    @classmethod
+    def desde_config(cls, nombre: str) -> 'Proveedor':
+        return cls(nombre, **PROVEEDORES[nombre])
+
+    @staticmethod
+    def _backoff(intento: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return retry_after
+        return min(30.0, 0.5 * (2 ** intento)) * random.uniform(0.8, 1.2)
+
+    async def ejecutar(self, operacion: Callable[[], Awaitable[Any]],
+                       reintentar_respuesta: Callable[[Any], bool] = None,
+                       reintentar_excepcion: Callable[[Exception], bool] = None,
+                       retry_after: Callable[[Any], Optional[float]] = None,
+                       es_error_remoto: Callable[[Exception], bool] = None) -> Any:
+        """
+        Ejecuta operacion() respetando el límite de tasa. Si la respuesta pide reintento (429/5xx)
+        o la excepción es transitoria, reintenta con backoff exponencial. Agotados los reintentos
+        cuenta un fallo para el circuit breaker y retorna la última respuesta (o relanza el error).
+        Si es_error_remoto dice que una excepción no viene del proveedor (archivo local dañado,
+        fallo de decodificación...), se relanza sin reintentar ni contar para el circuit breaker.
+        """
+        if not self.circuito.permitir():
+            raise ProveedorNoDisponible(f"{self.nombre} en enfriamiento")
+
+        for intento in range(self.reintentos + 1):
+            await self.limitador.adquirir()
+            try:
+                resultado = await operacion()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if es_error_remoto and not es_error_remoto(e):
+                    raise
+                if intento >= self.reintentos or not (reintentar_excepcion and reintentar_excepcion(e)):
+                    self._fallo(e)
+                    raise
+                espera = self._backoff(intento)
+                print(f"🔁 {self.nombre}: {e}. Reintento {intento + 1}/{self.reintentos} en {espera:.1f}s")
+                await asyncio.sleep(espera)
+            else:
+                if not (reintentar_respuesta and reintentar_respuesta(resultado)):
+                    self.circuito.registrar_exito()
+                    return resultado
+                if intento >= self.reintentos:
+                    self._fallo(f"respuesta {getattr(resultado, 'status_code', resultado)}")
+                    return resultado
+                # La pausa frena también al resto de peticiones concurrentes a este proveedor
+                espera = self._backoff(intento, retry_after(resultado) if retry_after else None)
+                self.limitador.pausar(espera)
+                print(f"🔁 {self.nombre}: respuesta {getattr(resultado, 'status_code', '?')}. Reintento {intento + 1}/{self.reintentos} en {espera:.1f}s")
+
+    def _fallo(self, motivo) -> None:
+        if self.circuito.registrar_fallo():
+            print(f"⛔ {self.nombre} desactivado {int(self.circuito.enfriamiento)}s tras fallos seguidos ({motivo})")
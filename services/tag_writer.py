@@ -0,0 +1,98 @@
+import base64
+import os
+from typing import Dict, Optional
+
+from mutagen.flac import Picture
+from mutagen.id3 import ID3, ID3NoHeaderError, APIC, TALB, TCON, TDOR, TDRC, TIT2, TPE1, TPOS, TRCK, USLT
+from mutagen.oggopus import OggOpus
+
+from config.settings import TAGS_PADDING
+
+
+class TagWriter:
+    """
+    Escribe todos los tags (ID3 o Vorbis Comment) en una sola pasada: los frames se arman en
+    memoria y el archivo se guarda una vez. Se reserva padding para que un re-etiquetado
+    posterior quepa en el espacio existente y sea una actualización de cabecera in situ.
+    """
+
+    def __init__(self, padding: int = TAGS_PADDING):
+        self.padding = padding
+
+    def _padding(self, info) -> int:
+        # Si lo nuevo cabe en el espacio actual se conserva el tamaño (sin copiar el audio);
+        # si no, se crece una sola vez dejando la reserva completa para la próxima.
+        if info.padding >= 0:
+            return info.padding
+        return self.padding
+
+    def escribir(self, ruta: str, tags: Dict, portada: Optional[bytes] = None) -> bool:
+        """
+        tags: titulo, artista, album, genero, track_number, disc_number, disc_count, anio, letra.
+        Los campos vacíos no se tocan (se conserva lo que ya tuviera el archivo).
+        """
+        ext = os.path.splitext(ruta)[1].lower()
+        try:
+            if ext == '.mp3':
+                self._escribir_mp3(ruta, tags, portada)
+            elif ext == '.opus':
+                self._escribir_opus(ruta, tags, portada)
+            else:
+                return False
+            return True
+        except Exception as e:
+            print(f"❌ Error guardando tags en '{os.path.basename(ruta)}': {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+    def _escribir_mp3(self, ruta: str, t: Dict, portada: Optional[bytes]) -> None:
+        try:
+            audio = ID3(ruta)
+        except ID3NoHeaderError:
+            audio = ID3()
+
+        def poner(frame_cls, valor):
+            if valor:
+                audio.setall(frame_cls.__name__, [frame_cls(encoding=3, text=str(valor))])
+
+        poner(TIT2, t.get('titulo'))
+        poner(TPE1, t.get('artista'))
+        poner(TALB, t.get('album'))
+        poner(TCON, t.get('genero'))
+        poner(TRCK, t.get('track_number'))
+        if t.get('disc_number'):
+            disco = str(t['disc_number'])
+            if t.get('disc_count'): disco += f"/{t['disc_count']}"
+            poner(TPOS, disco)
+        poner(TDRC, t.get('anio'))
+        poner(TDOR, t.get('anio'))
+
+        if portada:
+            audio.setall('APIC', [APIC(encoding=3, mime='image/jpeg', type=3, desc=u'Cover', data=portada)])
+        if t.get('letra'):
+            audio.setall('USLT', [USLT(encoding=3, lang=u'eng', desc=u'', text=t['letra'])])
+
+        audio.save(ruta, v2_version=3, padding=self._padding)
+
+    def _escribir_opus(self, ruta: str, t: Dict, portada: Optional[bytes]) -> None:
+        audio = OggOpus(ruta)
+
+        campos = {
+            'TITLE': t.get('titulo'), 'ARTIST': t.get('artista'), 'ALBUM': t.get('album'),
+            'GENRE': t.get('genero'), 'TRACKNUMBER': t.get('track_number'),
+            'DISCNUMBER': t.get('disc_number'), 'DISCTOTAL': t.get('disc_count'),
+            'DATE': t.get('anio'), 'YEAR': t.get('anio'), 'LYRICS': t.get('letra'),
+        }
+        for clave, valor in campos.items():
+            if valor: audio[clave] = str(valor)
+
+        if portada:
+            p = Picture()
+            p.data = portada
+            p.type = 3
+            p.mime = "image/jpeg"
+            p.desc = "Cover"
+            audio["metadata_block_picture"] = [base64.b64encode(p.write()).decode("ascii")]
+
+        audio.save(padding=self._padding)
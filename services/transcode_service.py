@@ -0,0 +1,49 @@
+import os
+from typing import Optional
+
+from config.settings import TRANSCODE_PROCESOS, MP3_CALIDAD, OPUS_BITRATE
+from utils.utils import Utils
+
+
+class TranscodeService:
+    """
+    Conversión de audio con ffmpeg, separada de las descargas.
+    En los lotes es una etapa propia del pipeline con max_procesos hilos (uno por núcleo,
+    cada hilo espera a su ffmpeg): las descargas siguen con el siguiente item mientras se convierte.
+    """
+
+    # Extensión de salida y argumentos de ffmpeg por formato destino
+    FORMATOS = {
+        'mp3': ('mp3', ['-c:a', 'libmp3lame', '-q:a', MP3_CALIDAD]),
+        'opus': ('opus', ['-c:a', 'libopus', '-b:a', OPUS_BITRATE]),
+    }
+
+    def __init__(self, max_procesos: int = TRANSCODE_PROCESOS):
+        self.max_procesos = max_procesos or os.cpu_count() or 2
+
+    def convertir(self, ruta: str, audio_format: str, codec_origen: Optional[str] = None) -> Optional[str]:
+        if not ruta or not os.path.exists(ruta): return None
+        if audio_format not in self.FORMATOS: return ruta
+
+        ext, argumentos = self.FORMATOS[audio_format]
+        base, ext_origen = os.path.splitext(ruta)
+        if ext_origen.lower() == f".{ext}":
+            return ruta
+
+        # Mismo códec: solo se cambia de contenedor (copia de stream, sin recodificar)
+        if (codec_origen or '').split('.')[0].lower() == audio_format:
+            argumentos = ['-c:a', 'copy']
+
+        destino = f"{base}.{ext}"
+        temporal = f"{base}.conv.{ext}"
+        if not Utils.convertir_audio(ruta, temporal, argumentos):
+            print(f"⚠️ Falló la conversión a {audio_format}: {os.path.basename(ruta)}")
+            if os.path.exists(temporal):
+                try: os.remove(temporal)
+                except OSError: pass
+            return None
+
+        os.replace(temporal, destino)
+        try: os.remove(ruta)
+        except OSError: pass
+        return destino
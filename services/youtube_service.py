@@ -1,15 +1,138 @@
 import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
 import yt_dlp
 from typing import Optional, Tuple, Dict, Any, Callable
 from config.config_manager import ConfigManager
+from services.cache_service import CacheService
 from utils.utils import Utils
+from config.settings import (INFO_CACHE_MAX_ENTRADAS, INFO_CACHE_TTL_SEGUNDOS, INFO_CACHE_MARGEN_SEGUNDOS,
+                             PLAYLIST_TAM_BLOQUE, PLAYLIST_CACHE_TTL_SEGUNDOS, PLAYLIST_CACHE_FRESCO_SEGUNDOS,
+                             MP3_CALIDAD)
 
 class YouTubeService:
     """Maneja SOLO la lógica de interacción con yt-dlp y descargas."""
     
-    def __init__(self, config_manager: ConfigManager):
+    # Instancias de YoutubeDL que cada hilo mantiene calientes (distintas combinaciones de opciones)
+    MAX_INSTANCIAS_POR_HILO = 4
+
+    # Cliente móvil para evitar bloqueos 403 de la versión Web. Sondeo y descarga usan el mismo,
+    # así los formato_id ofrecidos existen en la descarga y la info extraída se puede reutilizar.
+    EXTRACTOR_ARGS = {'youtube': {'player_client': ['android', 'ios']}}
+
+    def __init__(self, config_manager: ConfigManager, cache: CacheService = None):
         self.config_manager = config_manager
+        self.cache = cache  # Playlists ya analizadas (opcional)
         # Eliminada dependencia de MetadataService
+        self._local = threading.local()
+        self._ffmpeg_ok = None
+        self._info_cache = OrderedDict()  # video_id -> (info, expira)
+        self._info_lock = threading.Lock()
+
+    def _obtener_ydl(self, opciones: dict, hook: Callable = None) -> yt_dlp.YoutubeDL:
+        """
+        Retorna el YoutubeDL del hilo actual para estas opciones, creándolo solo la primera vez.
+        Así los extractores, el player JS y la caché de firmas se reutilizan entre items del lote.
+        El progress hook es por item: se redirige a través de un despachador fijo de la instancia.
+        """
+        instancias = getattr(self._local, 'instancias', None)
+        if instancias is None:
+            instancias = self._local.instancias = OrderedDict()
+
+        clave = json.dumps(opciones, sort_keys=True, default=str)
+        entrada = instancias.get(clave)
+        if entrada is None:
+            destino = {'hook': None}
+            opts = dict(opciones)
+            opts['progress_hooks'] = [lambda d: destino['hook'] and destino['hook'](d)]
+            entrada = (yt_dlp.YoutubeDL(opts), destino)
+            instancias[clave] = entrada
+            while len(instancias) > self.MAX_INSTANCIAS_POR_HILO:
+                _, (vieja, _) = instancias.popitem(last=False)
+                try: vieja.close()
+                except Exception: pass
+        else:
+            instancias.move_to_end(clave)
+
+        ydl, destino = entrada
+        destino['hook'] = hook
+        return ydl
+
+    @staticmethod
+    def porcentaje_progreso(d: dict) -> float:
+        """Porcentaje descargado a partir de un dict de progreso de yt-dlp."""
+        match = re.search(r"(\d+(\.\d+)?)", d.get('_percent_str', '') or '')
+        if match:
+            return float(match.group(1))
+        downloaded = d.get('downloaded_bytes', 0) or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        return (downloaded / total) * 100.0 if total else 0.0
+
+    def ultimo_error(self) -> Optional[str]:
+        """Mensaje del último fallo de descargar()/extraer_info() en el hilo actual (None si terminó bien)."""
+        return getattr(self._local, 'ultimo_error', None)
+
+    @staticmethod
+    def es_limitacion(mensaje: Optional[str]) -> bool:
+        """True si el error indica que YouTube está frenando (403/429), no un fallo del video."""
+        if not mensaje: return False
+        return any(m in mensaje for m in ("403", "Forbidden", "429", "Too Many Requests"))
+
+    def _ffmpeg_disponible(self) -> bool:
+        # Se comprueba una vez, no en cada descarga
+        if self._ffmpeg_ok is None:
+            self._ffmpeg_ok = Utils.verificar_ffmpeg()
+        return self._ffmpeg_ok
+
+    @staticmethod
+    def _id_video(url: str) -> Optional[str]:
+        match = re.search(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/)([\w-]{11})', url or '')
+        return match.group(1) if match else None
+
+    @staticmethod
+    def _expiracion_info(info: dict) -> float:
+        """Momento en que caduca la primera URL firmada de los formatos (parámetro expire= de googlevideo)."""
+        expiraciones = []
+        for formato in info.get('formats') or []:
+            match = re.search(r'[?&/]expire[=/](\d+)', formato.get('url') or '')
+            if match: expiraciones.append(int(match.group(1)))
+        if expiraciones:
+            return min(expiraciones) - INFO_CACHE_MARGEN_SEGUNDOS
+        return time.time() + INFO_CACHE_TTL_SEGUNDOS
+
+    def _guardar_info(self, info: dict) -> None:
+        if not info or info.get('_type', 'video') != 'video' or not info.get('id') or not info.get('formats'):
+            return
+        expira = self._expiracion_info(info)
+        if expira <= time.time():
+            return
+        with self._info_lock:
+            self._info_cache[info['id']] = (info, expira)
+            self._info_cache.move_to_end(info['id'])
+            while len(self._info_cache) > INFO_CACHE_MAX_ENTRADAS:
+                self._info_cache.popitem(last=False)
+
+    def _obtener_info(self, url: str) -> Optional[dict]:
+        """Info extraída previamente para este video, si sus URLs firmadas siguen vigentes."""
+        video_id = self._id_video(url)
+        if not video_id: return None
+        with self._info_lock:
+            entrada = self._info_cache.get(video_id)
+            if not entrada: return None
+            info, expira = entrada
+            if expira <= time.time():
+                del self._info_cache[video_id]
+                return None
+            self._info_cache.move_to_end(video_id)
+            return info
+
+    def _descartar_info(self, url: str) -> None:
+        video_id = self._id_video(url)
+        with self._info_lock:
+            self._info_cache.pop(video_id, None)
 
     def _get_client_args(self, is_mp4: bool) -> dict:
         return {}
@@ -42,249 +165,429 @@ class YouTubeService:
             pass
         return url
 
+    def _url_analisis(self, url: str) -> str:
+        url_limpia = self._clean_url(url)
+        if 'list=' in url_limpia and 'v=' not in url_limpia:
+             try:
+                from urllib.parse import urlparse, parse_qs
+                parsed = urlparse(url_limpia)
+                qs = parse_qs(parsed.query)
+                if 'list' in qs:
+                    playlist_id = qs['list'][0]
+                    url_limpia = f"https://www.youtube.com/playlist?list={playlist_id}"
+             except: pass
+        return url_limpia
+
+    @staticmethod
+    def _item_playlist(e: dict) -> Optional[Dict[str, Any]]:
+        """Convierte una entrada plana de la playlist en el item que muestra la UI."""
+        if not e: return None
+        vid_title = e.get('title', 'Video sin título')
+        vid_id = e.get('id')
+        vid_url = e.get('url')
+
+        vid_uploader = e.get('uploader') or e.get('channel') or "Varios"
+        vid_duration = e.get('duration_string') or e.get('duration')
+        vid_thumbnail = e.get('thumbnail')
+
+        if not vid_thumbnail and vid_id:
+            vid_thumbnail = f"https://i.ytimg.com/vi/{vid_id}/mqdefault.jpg"
+
+        if isinstance(vid_duration, (int, float)):
+            m, s = divmod(int(vid_duration), 60)
+            if m > 60:
+                h, m = divmod(m, 60)
+                vid_duration = f"{h}:{m:02d}:{s:02d}"
+            else:
+                vid_duration = f"{m}:{s:02d}"
+
+        vid_duration = str(vid_duration) if vid_duration else "??"
+
+        if not vid_url and vid_id:
+            vid_url = f"https://www.youtube.com/watch?v={vid_id}"
+
+        if not vid_url: return None
+        return {
+            'id': vid_id,
+            'title': vid_title,
+            'url': vid_url,
+            'uploader': vid_uploader,
+            'duration': vid_duration,
+            'thumbnail': vid_thumbnail
+        }
+
+    def _datos_video(self, info: dict) -> Dict[str, Any]:
+        self._guardar_info(info)
+        titulo = info.get('title', 'Sin título')
+        dur = info.get('duration', 0) or 0
+        mins, secs = divmod(dur, 60)
+        hours, mins = divmod(mins, 60)
+        if hours > 0:
+            dur_str = f"{int(hours)}h {int(mins)}m {int(secs)}s"
+        else:
+            dur_str = f"{int(mins)}m {int(secs)}s"
+        return {
+            'type': 'video',
+            'title': titulo,
+            'thumbnail': info.get('thumbnail', ''),
+            'duration': dur_str,
+            'uploader': info.get('uploader', 'Desconocido'),
+            'playlist_items': []
+        }
+
     def obtener_info_basica(self, url: str) -> Tuple[Optional[Dict[str, Any]], str]:
-        opciones = {'quiet': True, 'no_warnings': True, 'extract_flat': True}
+        opciones = {'quiet': True, 'no_warnings': True, 'extract_flat': True,
+                    'extractor_args': self.EXTRACTOR_ARGS}
 
         try:
-            url_limpia = self._clean_url(url)
-            
-            if 'list=' in url_limpia and 'v=' not in url_limpia:
-                 try:
-                    from urllib.parse import urlparse, parse_qs
-                    parsed = urlparse(url_limpia)
-                    qs = parse_qs(parsed.query)
-                    if 'list' in qs:
-                        playlist_id = qs['list'][0]
-                        url_limpia = f"https://www.youtube.com/playlist?list={playlist_id}"
-                 except: pass
-
-            with yt_dlp.YoutubeDL(opciones) as ydl:
-                info = ydl.extract_info(url_limpia, download=False)
+            url_limpia = self._url_analisis(url)
+
+            ydl = self._obtener_ydl(opciones)
+            info = ydl.extract_info(url_limpia, download=False)
                 
-                _type = info.get('_type', 'video')
-                has_entries = 'entries' in info
-                print(f"🕵️ Extraction Info: Type={_type}, HasEntries={has_entries}, Title={info.get('title')}")
+            _type = info.get('_type', 'video')
+            has_entries = 'entries' in info
+            print(f"🕵️ Extraction Info: Type={_type}, HasEntries={has_entries}, Title={info.get('title')}")
 
-                es_playlist = _type == 'playlist' or has_entries
+            es_playlist = _type == 'playlist' or has_entries
                 
-                if es_playlist:
-                     titulo = info.get('title', 'Playlist Desconocida')
-                     entries = list(info.get('entries', []))
-                     count = len(entries)
-                     dur_str = f"{count} Videos"
-                     
-                     thumbnail = info.get('thumbnail')
-                     if not thumbnail and entries:
-                         first_entry = entries[0]
-                         if first_entry:
-                             thumbnail = first_entry.get('thumbnail')
-                             if not thumbnail and first_entry.get('url'):
-                                 try:
-                                      with yt_dlp.YoutubeDL({'quiet': True}) as ydl_thumb:
-                                          info_thumb = ydl_thumb.extract_info(first_entry['url'], download=False)
-                                          thumbnail = info_thumb.get('thumbnail')
-                                 except:
-                                     pass
+            if es_playlist:
+                 titulo = info.get('title', 'Playlist Desconocida')
+                 entries = list(info.get('entries', []))
+                 count = len(entries)
+                 dur_str = f"{count} Videos"
                      
-                     uploader = info.get('uploader') or info.get('channel') or "Varios"
+                 thumbnail = info.get('thumbnail')
+                 if not thumbnail and entries:
+                     first_entry = entries[0]
+                     if first_entry:
+                         thumbnail = first_entry.get('thumbnail')
+                         if not thumbnail and first_entry.get('url'):
+                             try:
+                                  ydl_thumb = self._obtener_ydl({'quiet': True})
+                                  info_thumb = ydl_thumb.extract_info(first_entry['url'], download=False)
+                                  thumbnail = info_thumb.get('thumbnail')
+                             except:
+                                 pass
                      
-                     playlist_items = []
-                     for e in entries:
-                         if not e: continue
-                         vid_title = e.get('title', 'Video sin título')
-                         vid_id = e.get('id')
-                         vid_url = e.get('url')
-                         
-                         vid_uploader = e.get('uploader') or e.get('channel') or "Varios"
-                         vid_duration = e.get('duration_string') or e.get('duration')
-                         vid_thumbnail = e.get('thumbnail') 
-                         
-                         if not vid_thumbnail and vid_id:
-                             vid_thumbnail = f"https://i.ytimg.com/vi/{vid_id}/mqdefault.jpg"
-
-                         if isinstance(vid_duration, (int, float)):
-                             m, s = divmod(int(vid_duration), 60)
-                             if m > 60:
-                                 h, m = divmod(m, 60)
-                                 vid_duration = f"{h}:{m:02d}:{s:02d}"
-                             else:
-                                 vid_duration = f"{m}:{s:02d}"
-                         
-                         vid_duration = str(vid_duration) if vid_duration else "??"
-
-                         if not vid_url and vid_id:
-                             vid_url = f"https://www.youtube.com/watch?v={vid_id}"
-                             
-                         if vid_url:
-                             playlist_items.append({
-                                 'title': vid_title, 
-                                 'url': vid_url,
-                                 'uploader': vid_uploader,
-                                 'duration': vid_duration,
-                                 'thumbnail': vid_thumbnail
-                             })
-
-                     return {
-                        'type': 'playlist',
-                        'title': titulo,
-                        'duration': dur_str,
-                        'uploader': uploader,
-                        'thumbnail': thumbnail,
-                        'playlist_items': playlist_items
-                     }, 'OK'
+                 uploader = info.get('uploader') or info.get('channel') or "Varios"
+                 playlist_items = [item for item in map(self._item_playlist, entries) if item]
 
-                else:
-                    titulo = info.get('title', 'Sin título')
-                    playlist_items = []
-                    dur = info.get('duration', 0)
-                    mins, secs = divmod(dur, 60)
-                    hours, mins = divmod(mins, 60)
-                    if hours > 0:
-                        dur_str = f"{int(hours)}h {int(mins)}m {int(secs)}s"
-                    else:
-                        dur_str = f"{int(mins)}m {int(secs)}s"
-                    thumbnail = info.get('thumbnail', '')
-                    uploader = info.get('uploader', 'Desconocido')
-
-                    video_data = {
-                        'type': 'video',
-                        'title': titulo,
-                        'thumbnail': thumbnail,
-                        'duration': dur_str, 
-                        'uploader': uploader,
-                        'playlist_items': playlist_items
-                    }
-                    return video_data, 'OK'
+                 return {
+                    'type': 'playlist',
+                    'title': titulo,
+                    'duration': dur_str,
+                    'uploader': uploader,
+                    'thumbnail': thumbnail,
+                    'playlist_items': playlist_items
+                 }, 'OK'
+
+            else:
+                return self._datos_video(info), 'OK'
         except Exception as e:
             return None, str(e)
 
+    @staticmethod
+    def _id_playlist(url: str) -> Optional[str]:
+        match = re.search(r'[?&]list=([\w-]+)', url or '')
+        return match.group(1) if match else None
+
+    @staticmethod
+    def _emitir_items(data: dict, items: list, on_items: Callable, tam_bloque: int) -> None:
+        for i in range(0, len(items), tam_bloque):
+            bloque = items[i:i + tam_bloque]
+            desde = len(data['playlist_items'])
+            data['playlist_items'].extend(bloque)
+            if on_items: on_items(bloque, desde)
+
+    def _guardar_playlist(self, playlist_id: str, data: dict) -> None:
+        if self.cache and playlist_id:
+            self.cache.guardar('playlist', playlist_id, {'guardado': time.time(), 'data': data},
+                               ttl=PLAYLIST_CACHE_TTL_SEGUNDOS)
+
+    def obtener_info_streaming(self, url: str, on_inicio: Callable = None, on_items: Callable = None,
+                               cancelado: Callable = None, refrescar: bool = False,
+                               tam_bloque: int = PLAYLIST_TAM_BLOQUE,
+                               on_quitados: Callable = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Variante incremental de obtener_info_basica para playlists grandes.
+        Las entradas se consumen a medida que yt-dlp pagina (extract_info con process=False deja
+        'entries' como generador) y se entregan en bloques:
+          on_inicio(data)       -> en cuanto se conoce la cabecera (data['playlist_items'] crece después)
+          on_items(items, desde)-> cada bloque de items nuevos, 'desde' es el índice del primero
+          on_quitados(ids)      -> IDs que ya no están en la playlist (se quitan de data['playlist_items'])
+          cancelado()           -> si retorna True se deja de paginar
+        Una playlist ya analizada se entrega al instante desde la caché. Si esa copia tiene más de
+        PLAYLIST_CACHE_FRESCO_SEGUNDOS (o con refrescar=True) después se enumera completa y solo se
+        informan las diferencias: agregados al final vía on_items y quitados vía on_quitados.
+        Retorna (data, 'OK') con la lista completa al terminar, igual que obtener_info_basica.
+        """
+        try:
+            url_limpia = self._url_analisis(url)
+            playlist_id = self._id_playlist(url_limpia) if 'v=' not in url_limpia else None
+
+            previo = None
+            if self.cache and playlist_id:
+                _, previo = self.cache.obtener('playlist', playlist_id)
+            if previo:
+                return self._reconciliar_playlist(url_limpia, playlist_id, previo, on_inicio, on_items,
+                                                  on_quitados, cancelado, refrescar, tam_bloque)
+
+            ydl, info = self._extraer_playlist(url_limpia)
+            _type = info.get('_type', 'video')
+            print(f"🕵️ Extraction Info (streaming): Type={_type}, Title={info.get('title')}")
+
+            if _type != 'playlist' and 'entries' not in info:
+                data = self._datos_video(ydl.process_ie_result(info, download=False))
+                if on_inicio: on_inicio(data)
+                return data, 'OK'
+
+            data = {
+                'type': 'playlist',
+                'id': info.get('id'),
+                'title': info.get('title', 'Playlist Desconocida'),
+                'duration': "? Videos",
+                'uploader': info.get('uploader') or info.get('channel') or "Varios",
+                'thumbnail': info.get('thumbnail'),
+                'playlist_items': [],
+                'completo': False
+            }
+            if on_inicio: on_inicio(data)
+
+            bloque = []
+            cancelada = False
+            for item in self._items_playlist(info):
+                if cancelado and cancelado():
+                    cancelada = True
+                    break
+                bloque.append(item)
+                if len(bloque) >= tam_bloque:
+                    self._emitir_items(data, bloque, on_items, tam_bloque)
+                    bloque = []
+            if bloque:
+                self._emitir_items(data, bloque, on_items, tam_bloque)
+
+            playlist_items = data['playlist_items']
+            if not data['thumbnail'] and playlist_items:
+                data['thumbnail'] = playlist_items[0].get('thumbnail')
+            data['duration'] = f"{len(playlist_items)} Videos"
+            data['completo'] = True
+            if not cancelada:
+                self._guardar_playlist(playlist_id, data)
+            return data, 'OK'
+        except Exception as e:
+            return None, str(e)
+
+    def _extraer_playlist(self, url_limpia: str):
+        """(ydl, info) de la cabecera sin enumerar: 'entries' queda como generador."""
+        opciones = {'quiet': True, 'no_warnings': True, 'extract_flat': True,
+                    'extractor_args': self.EXTRACTOR_ARGS}
+        ydl = self._obtener_ydl(opciones)
+        info = ydl.extract_info(url_limpia, download=False, process=False)
+        # Las URLs de playlist suelen redirigir (_type 'url') al extractor de pestañas
+        for _ in range(3):
+            if info.get('_type') not in ('url', 'url_transparent'): break
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        return ydl, info
+
+    def _items_playlist(self, info: dict):
+        for entrada in info.get('entries') or []:
+            item = self._item_playlist(entrada)
+            if item: yield item
+
+    def _reconciliar_playlist(self, url_limpia: str, playlist_id: str, previo: dict, on_inicio: Callable,
+                              on_items: Callable, on_quitados: Callable, cancelado: Callable,
+                              refrescar: bool, tam_bloque: int) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Entrega la copia en caché al instante y, si hace falta, la compara con la playlist actual."""
+        print(f"📦 Playlist en caché: {previo['data'].get('title')}")
+        data = dict(previo['data'], playlist_items=[], completo=False)
+        if on_inicio: on_inicio(data)
+        self._emitir_items(data, previo['data']['playlist_items'], on_items, tam_bloque)
+
+        if not refrescar and time.time() - previo['guardado'] < PLAYLIST_CACHE_FRESCO_SEGUNDOS:
+            data['completo'] = True
+            return data, 'OK'
+
+        # Un item puede agregarse o quitarse en cualquier posición: solo la lista completa lo dice
+        print("🔄 Verificando cambios de la playlist...")
+        _, info = self._extraer_playlist(url_limpia)
+        actuales = []
+        for item in self._items_playlist(info):
+            if cancelado and cancelado():
+                data['completo'] = True
+                return data, 'OK'  # Se queda con lo de la caché
+            actuales.append(item)
+
+        ids_actuales = {i.get('id') for i in actuales}
+        ids_previos = {i.get('id') for i in data['playlist_items']}
+        quitados = [i.get('id') for i in data['playlist_items'] if i.get('id') not in ids_actuales]
+        nuevos = [i for i in actuales if i.get('id') not in ids_previos]
+        print(f"🔄 Playlist actualizada: {len(nuevos)} nuevos, {len(quitados)} quitados")
+
+        if quitados:
+            data['playlist_items'][:] = [i for i in data['playlist_items'] if i.get('id') in ids_actuales]
+            if on_quitados: on_quitados(quitados)
+        self._emitir_items(data, nuevos, on_items, tam_bloque)
+
+        data['title'] = info.get('title') or data['title']
+        data['duration'] = f"{len(data['playlist_items'])} Videos"
+        data['completo'] = True
+        # En disco queda el orden real de YouTube; en esta sesión los agregados van al final
+        self._guardar_playlist(playlist_id, dict(data, playlist_items=actuales))
+        return data, 'OK'
+
+    def extraer_info(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Extrae (sin descargar ni seleccionar formato) la info de un video y la deja en la caché,
+        para que descargar() arranque directamente. Es la etapa 'extraer' de los lotes.
+        """
+        url = self._clean_url(url)
+        self._local.ultimo_error = None
+        info = self._obtener_info(url)
+        if info is not None:
+            return info
+        opciones = {'quiet': True, 'no_warnings': True, 'noplaylist': True, 'extractor_args': self.EXTRACTOR_ARGS}
+        try:
+            info = self._obtener_ydl(opciones).extract_info(url, download=False, process=False)
+            self._guardar_info(info)
+            return info
+        except Exception as e:
+            msg = str(e)
+            self._local.ultimo_error = msg
+            if "403" in msg or "Forbidden" in msg:
+                print(f"🔒 Acceso denegado (403) en '{url}'. Saltando...")
+            else:
+                print(f"Error extrayendo info: {e}")
+            return None
+
     def obtener_calidades_disponibles(self, url: str, video_codec: str = 'any') -> Dict[int, Dict[str, Any]]:
         es_mp4 = (video_codec == 'mp4')
-        opciones = {'quiet': True, 'no_warnings': True}
+        opciones = {'quiet': True, 'no_warnings': True, 'extractor_args': self.EXTRACTOR_ARGS}
         opciones.update(self._get_client_args(es_mp4))
         
         url = self._clean_url(url)
 
         try:
-            with yt_dlp.YoutubeDL(opciones) as ydl:
+            info = self._obtener_info(url)
+            if info is None:
+                ydl = self._obtener_ydl(opciones)
                 info = ydl.extract_info(url, download=False)
-                formatos = info.get('formats', [])
-                calidades = {}
-                nombres_calidad = {
-                    144: '144p', 240: '240p', 360: '360p', 480: '480p',
-                    720: '720p HD', 1080: '1080p Full HD', 1440: '1440p 2K',
-                    2160: '2160p 4K', 4320: '4320p 8K'
-                }
+                self._guardar_info(info)
+            formatos = info.get('formats', [])
+            calidades = {}
+            nombres_calidad = {
+                144: '144p', 240: '240p', 360: '360p', 480: '480p',
+                720: '720p HD', 1080: '1080p Full HD', 1440: '1440p 2K',
+                2160: '2160p 4K', 4320: '4320p 8K'
+            }
                 
-                mejor_audio_size = 0
-                for formato in formatos:
-                    if formato.get('vcodec') == 'none' and formato.get('acodec') != 'none':
-                        audio_size = formato.get('filesize', 0) or formato.get('filesize_approx', 0)
-                        if audio_size > mejor_audio_size: mejor_audio_size = audio_size
+            mejor_audio_size = 0
+            for formato in formatos:
+                if formato.get('vcodec') == 'none' and formato.get('acodec') != 'none':
+                    audio_size = formato.get('filesize', 0) or formato.get('filesize_approx', 0)
+                    if audio_size > mejor_audio_size: mejor_audio_size = audio_size
                     
-                duracion = info.get('duration', 0)
+            duracion = info.get('duration', 0)
                 
-                for formato in formatos:
-                    vcodec = formato.get('vcodec', 'none')
-                    altura = formato.get('height', 0)
-                    ext = formato.get('ext')
-                    fid = formato.get('format_id')
+            for formato in formatos:
+                vcodec = formato.get('vcodec', 'none')
+                altura = formato.get('height', 0)
+                ext = formato.get('ext')
+                fid = formato.get('format_id')
                     
-                    if vcodec == 'none': continue
+                if vcodec == 'none': continue
                     
-                    is_vp9 = 'vp9' in vcodec or 'vp09' in vcodec
-                    is_avc = 'avc' in vcodec or 'h264' in vcodec
+                is_vp9 = 'vp9' in vcodec or 'vp09' in vcodec
+                is_avc = 'avc' in vcodec or 'h264' in vcodec
                     
-                    # if video_codec == 'webm' and not is_vp9 and ext != 'webm': 
-                    #     continue
+                # if video_codec == 'webm' and not is_vp9 and ext != 'webm': 
+                #     continue
                         
-                    # if video_codec == 'mp4':
-                    #     if not is_avc and ext != 'mp4':
-                    #         continue
+                # if video_codec == 'mp4':
+                #     if not is_avc and ext != 'mp4':
+                #         continue
                     
-                    if not altura or altura < 144: continue
+                if not altura or altura < 144: continue
                     
-                    proto = formato.get('protocol', '')
-                    if 'm3u8' in proto: pass 
-
-                    video_size = formato.get('filesize', 0) or formato.get('filesize_approx', 0)
-                    tamaño_total = video_size
-                    if formato.get('acodec') == 'none' and mejor_audio_size > 0:
-                        tamaño_total += mejor_audio_size
-                    if tamaño_total == 0 and duracion > 0:
-                        tbr = formato.get('tbr', 0)
-                        if tbr > 0: tamaño_total = int((tbr * duracion * 1024) / 8)
+                proto = formato.get('protocol', '')
+                if 'm3u8' in proto: pass 
+
+                video_size = formato.get('filesize', 0) or formato.get('filesize_approx', 0)
+                tamaño_total = video_size
+                if formato.get('acodec') == 'none' and mejor_audio_size > 0:
+                    tamaño_total += mejor_audio_size
+                if tamaño_total == 0 and duracion > 0:
+                    tbr = formato.get('tbr', 0)
+                    if tbr > 0: tamaño_total = int((tbr * duracion * 1024) / 8)
                     
-                    nombre_calidad = nombres_calidad.get(altura, f'{altura}p')
-                    fps = formato.get('fps', 0)
-                    if fps and fps > 30: nombre_calidad += f' {int(fps)}fps'
+                nombre_calidad = nombres_calidad.get(altura, f'{altura}p')
+                fps = formato.get('fps', 0)
+                if fps and fps > 30: nombre_calidad += f' {int(fps)}fps'
                     
-                    if is_vp9: nombre_calidad += ' (VP9)'
+                if is_vp9: nombre_calidad += ' (VP9)'
                     
-                    # Preference logic
-                    matches_preference = False
-                    if video_codec == 'webm':
-                        if is_vp9 or ext == 'webm': matches_preference = True
-                    elif video_codec == 'mp4':
-                        if is_avc or ext == 'mp4': matches_preference = True
-                    else:
-                        matches_preference = True
+                # Preference logic
+                matches_preference = False
+                if video_codec == 'webm':
+                    if is_vp9 or ext == 'webm': matches_preference = True
+                elif video_codec == 'mp4':
+                    if is_avc or ext == 'mp4': matches_preference = True
+                else:
+                    matches_preference = True
 
-                    actualizar = False
-                    if altura not in calidades: 
+                actualizar = False
+                if altura not in calidades: 
+                    actualizar = True
+                else:
+                    info_existente = calidades[altura]
+                    prev_pref = info_existente.get('preferred', False)
+                        
+                    if matches_preference and not prev_pref:
                         actualizar = True
+                    elif not matches_preference and prev_pref:
+                        actualizar = False
                     else:
-                        info_existente = calidades[altura]
-                        prev_pref = info_existente.get('preferred', False)
-                        
-                        if matches_preference and not prev_pref:
-                            actualizar = True
-                        elif not matches_preference and prev_pref:
-                            actualizar = False
-                        else:
-                            # Tie-breakers if preference status is equal
-                            if fps > info_existente['fps']: actualizar = True
-                            elif fps == info_existente['fps']:
-                                if tamaño_total > info_existente['tamaño']: actualizar = True
-
-                    if actualizar:
-                        calidades[altura] = {
-                            'nombre': nombre_calidad,
-                            'resolucion': f"{formato.get('width',0)}x{altura}",
-                            'tamaño': tamaño_total,
-                            'formato_id': formato.get('format_id'), 
-                            'ext': formato.get('ext', 'mp4'),
-                            'fps': fps,
-                            'preferred': matches_preference
-                        }
-                return calidades
+                        # Tie-breakers if preference status is equal
+                        if fps > info_existente['fps']: actualizar = True
+                        elif fps == info_existente['fps']:
+                            if tamaño_total > info_existente['tamaño']: actualizar = True
+
+                if actualizar:
+                    calidades[altura] = {
+                        'nombre': nombre_calidad,
+                        'resolucion': f"{formato.get('width',0)}x{altura}",
+                        'tamaño': tamaño_total,
+                        'formato_id': formato.get('format_id'), 
+                        'ext': formato.get('ext', 'mp4'),
+                        'fps': fps,
+                        'preferred': matches_preference
+                    }
+            return calidades
         except Exception as e:
             return {}
 
     def descargar(self, url: str, tipo: str, formato_id: str = None, audio_format: str = 'mp3', directorio: str = '', 
-                  contenedor: str = 'mp4', progress_callback: Callable = None, status_callback: Callable = None) -> Optional[str]:
+                  contenedor: str = 'mp4', progress_callback: Callable = None, status_callback: Callable = None,
+                  convertir_audio: bool = True, hook_callback: Callable = None) -> Optional[str]:
         """
         Retorna la ruta del archivo descargado si es exitoso, o None.
         YA NO realiza etiquetado.
+        Con convertir_audio=False (música) se entrega el audio tal como se descargó, sin ffmpeg:
+        la conversión queda a cargo del llamador (TranscodeService en los lotes).
+        hook_callback recibe el dict de progreso de yt-dlp tal cual (bytes, velocidad...).
         """
         url = self._clean_url(url)
+        self._local.ultimo_error = None
         
         if not os.path.exists(directorio): os.makedirs(directorio)
 
         def hook(d):
+            if hook_callback:
+                try: hook_callback(d)
+                except Exception: pass
             if d['status'] == 'downloading':
                 try:
-                    p = 0.0
-                    p_str = d.get('_percent_str', '')
-                    import re
-                    match = re.search(r"(\d+(\.\d+)?)", p_str)
-                    if match:
-                        p = float(match.group(1))
-                    else:
-                        downloaded = d.get('downloaded_bytes', 0)
-                        total = d.get('total_bytes') or d.get('total_bytes_estimate')
-                        if total: p = (downloaded / total) * 100.0
-                            
+                    p = self.porcentaje_progreso(d)
                     if progress_callback: progress_callback(p)
                     if status_callback:
                         eta = d.get('_eta_str', '?')
@@ -300,29 +603,33 @@ class YouTubeService:
             'no_warnings': True,
             'ignoreerrors': False,
             'nocheckcertificate': True,
-            'progress_hooks': [hook],
             'noplaylist': True, 
             'retries': 3,
+            # Retomar los .part que haya dejado una ejecución interrumpida (lotes reanudados)
+            'continuedl': True,
             'file_access_retries': 3,
             'fragment_retries': 3,
-            # Simular cliente móvil para evitar bloqueos 403 de la versión Web
-            'extractor_args': {'youtube': {'player_client': ['android', 'ios']}},
+            'extractor_args': self.EXTRACTOR_ARGS,
         }
         
         es_mp4 = (tipo == 'video' and contenedor == 'mp4')
         opciones.update(self._get_client_args(es_mp4))
         
-        ffmpeg_ok = Utils.verificar_ffmpeg()
+        ffmpeg_ok = self._ffmpeg_disponible()
 
         if tipo == 'musica':
             opciones['format'] = 'bestaudio/best'
             if ffmpeg_ok:
+                # Preferir una fuente que ya esté en el códec destino: la conversión se reduce a remuxear
+                # con copia de stream (sin decodificar/codificar). Solo se transcodifica si no existe.
+                opciones['format'] = f"bestaudio[acodec={audio_format}]/bestaudio/best"
+            if ffmpeg_ok and convertir_audio:
                 pp_args = {
                     'key': 'FFmpegExtractAudio',
                     'preferredcodec': audio_format,
                 }
                 if audio_format == 'mp3':
-                    pp_args['preferredquality'] = '320'
+                    pp_args['preferredquality'] = MP3_CALIDAD
                 
                 opciones['postprocessors'] = [pp_args]
         
@@ -350,33 +657,51 @@ class YouTubeService:
                       opciones['format'] = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
 
         try:
-            with yt_dlp.YoutubeDL(opciones) as ydl:
+            ydl = self._obtener_ydl(opciones, hook)
+            info_previa = self._obtener_info(url)
+            info = None
+            if info_previa is not None:
+                # Descargar desde la info ya extraída (sondeo de calidades / análisis): sin segunda extracción
+                try:
+                    info = ydl.process_ie_result(
+                        ydl.sanitize_info(info_previa, remove_private_keys=True), download=True)
+                except Exception as e:
+                    print(f"♻️ Info en caché no válida ({e}), extrayendo de nuevo...")
+                    self._descartar_info(url)
+                    info = None
+            if info is None:
                 info = ydl.extract_info(url, download=True)
                 
-                # Retornar ruta final
-                if tipo == 'musica' and info:
-                    temp_path = ydl.prepare_filename(info)
-                    base, _ = os.path.splitext(temp_path)
-                    final_path = f"{base}.{audio_format}"
+            # Retornar ruta final
+            if tipo == 'musica' and info and not convertir_audio:
+                descargas = info.get('requested_downloads') or [{}]
+                ruta_cruda = descargas[0].get('filepath') or ydl.prepare_filename(info)
+                if os.path.exists(ruta_cruda):
+                    return ruta_cruda, info
+            elif tipo == 'musica' and info:
+                temp_path = ydl.prepare_filename(info)
+                base, _ = os.path.splitext(temp_path)
+                final_path = f"{base}.{audio_format}"
                     
-                    if os.path.exists(final_path):
-                         # Return tuple: (path, info_dict_for_hints)
-                         return final_path, info
-                elif tipo == 'video' and info:
-                     final_path = ydl.prepare_filename(info)
-                     # yt-dlp a veces cambia ext post merge, pero por ahora confiamos en outtmpl o check
-                     if os.path.exists(final_path):
-                          return final_path, info
+                if os.path.exists(final_path):
+                     # Return tuple: (path, info_dict_for_hints)
+                     return final_path, info
+            elif tipo == 'video' and info:
+                 final_path = ydl.prepare_filename(info)
+                 # yt-dlp a veces cambia ext post merge, pero por ahora confiamos en outtmpl o check
+                 if os.path.exists(final_path):
+                      return final_path, info
                      
-                     # Check with merged extension if failed
-                     base, _ = os.path.splitext(final_path)
-                     ext = opciones.get('merge_output_format') or contenedor
-                     path_merged = f"{base}.{ext}"
-                     if os.path.exists(path_merged):
-                         return path_merged, info
+                 # Check with merged extension if failed
+                 base, _ = os.path.splitext(final_path)
+                 ext = opciones.get('merge_output_format') or contenedor
+                 path_merged = f"{base}.{ext}"
+                 if os.path.exists(path_merged):
+                     return path_merged, info
                          
         except Exception as e:
             msg = str(e)
+            self._local.ultimo_error = msg
             if "403" in msg or "Forbidden" in msg:
                 print(f"🔒 Acceso denegado (403) en '{url}'. Saltando...")
             else:
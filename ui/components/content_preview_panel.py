@@ -1,15 +1,23 @@
 import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageTk
-import requests
 from io import BytesIO
-import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.http_client import HttpClient
 
 class ContentPreviewPanel(ttk.Frame):
-    def __init__(self, parent):
+    # Miniaturas de la lista: pocos hilos compartidos en vez de uno por item (playlists de miles)
+    _pool_miniaturas = ThreadPoolExecutor(max_workers=6, thread_name_prefix="miniaturas")
+
+    def __init__(self, parent, on_refresh=None):
         super().__init__(parent)
+        self.on_refresh = on_refresh
         self.current_image = None
         self.playlist_vars = []
+        self.playlist_filas = []  # (id, card, label del título, título) alineado con playlist_vars
+        self.playlist_check_frame = None
+        self.lbl_count = None
+        self.cargando = False
         
         # We use a dynamic container for the content
         self.container = ttk.Frame(self)
@@ -20,6 +28,9 @@ class ContentPreviewPanel(ttk.Frame):
             widget.destroy()
         self.current_image = None
         self.playlist_vars = []
+        self.playlist_filas = []
+        self.playlist_check_frame = None
+        self.lbl_count = None
 
     def update_content(self, video_data, thumbnail_data=None):
         self.clear()
@@ -33,9 +44,10 @@ class ContentPreviewPanel(ttk.Frame):
         if video_data['type'] != 'playlist':
             self._show_single_video_preview(video_data, thumbnail_data)
 
-        # 2. Playlist Items
-        if video_data.get('playlist_items'):
-            self._show_playlist_items(video_data['playlist_items'])
+        # 2. Playlist Items (en modo incremental la lista puede llegar vacía y crecer con append_playlist_items)
+        if video_data['type'] == 'playlist' or video_data.get('playlist_items'):
+            self._show_playlist_items(list(video_data.get('playlist_items', [])),
+                                      cargando=not video_data.get('completo', True))
 
     def _show_single_video_preview(self, video_data, thumbnail_data):
         preview_frame = ttk.Frame(self.container)
@@ -62,10 +74,10 @@ class ContentPreviewPanel(ttk.Frame):
         ttk.Label(info_frame, text=f"Duración: {video_data.get('duration', '?')}", style="Info.TLabel").pack(anchor="w")
         ttk.Label(info_frame, text=f"Canal: {video_data.get('uploader', 'Unknown')}", style="Info.TLabel").pack(anchor="w")
 
-    def _show_playlist_items(self, items):
-        if not items: return
-        
-        ttk.Label(self.container, text=f"Selecciona las Canciones ({len(items)}):", font=("Segoe UI", 9, "bold")).pack(fill=tk.X, pady=(10, 5))
+    def _show_playlist_items(self, items, cargando=False):
+        self.cargando = cargando
+        self.lbl_count = ttk.Label(self.container, font=("Segoe UI", 9, "bold"))
+        self.lbl_count.pack(fill=tk.X, pady=(10, 5))
         
         list_container = ttk.Frame(self.container)
         list_container.pack(fill=tk.X, pady=(0, 10))
@@ -98,13 +110,37 @@ class ContentPreviewPanel(ttk.Frame):
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         self.playlist_vars = []
-        
+        self.playlist_filas = []
+        self.playlist_check_frame = playlist_check_frame
+
+        # Buttons for selection
+        btn_sel_frame = ttk.Frame(self.container)
+        btn_sel_frame.pack(fill=tk.X, pady=(0, 20))
+        ttk.Button(btn_sel_frame, text="Marcar Todas", width=15, command=self.sel_all).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(btn_sel_frame, text="Desmarcar Todas", width=15, command=self.sel_none).pack(side=tk.LEFT)
+        # La lista puede venir de la caché: permite volver a consultar a YouTube sin esperar a que venza
+        if self.on_refresh:
+            ttk.Button(btn_sel_frame, text="🔄 Actualizar", width=12, command=self.on_refresh).pack(side=tk.RIGHT)
+
+        self.append_playlist_items(items)
+
+    def append_playlist_items(self, items, desde=None):
+        """
+        Agrega un bloque de items al final de la lista (análisis incremental).
+        'desde' es el índice del primer item del bloque; lo que ya se mostró se omite.
+        """
+        if not self.playlist_check_frame or not self.playlist_check_frame.winfo_exists():
+            return
+        if desde is not None:
+            items = items[max(0, len(self.playlist_vars) - desde):]
+
         # Create items
         CTX_SURFACE = "#181818" # Copied from main_window, ideally passed or styled
         CTX_TEXT = "#FFFFFF"
         CTX_TEXT_SEC = "#B3B3B3"
         
-        for i, item in enumerate(items):
+        playlist_check_frame = self.playlist_check_frame
+        for i, item in enumerate(items, start=len(self.playlist_vars)):
             card = ttk.Frame(playlist_check_frame, style="FlatCard.TFrame", padding=(5, 5))
             card.pack(fill=tk.X, expand=True, pady=1)
             
@@ -121,26 +157,49 @@ class ContentPreviewPanel(ttk.Frame):
             lbl_thumb.pack(fill=tk.BOTH, expand=True)
             
             if item.get('thumbnail'):
-                threading.Thread(target=self._cargar_thumbnail_async, args=(item.get('thumbnail'), lbl_thumb), daemon=True).start()
+                self._pool_miniaturas.submit(self._cargar_thumbnail_async, item.get('thumbnail'), lbl_thumb)
                 
             info_sub = ttk.Frame(card, style="FlatCard.TFrame")
             info_sub.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
             
             # Using hardcoded colors/fonts here to match original logic, simpler than full style dependency injection for now
-            ttk.Label(info_sub, text=f"{i+1}. {item.get('title')}", font=("Segoe UI", 10, "bold"), background=CTX_SURFACE, foreground=CTX_TEXT).pack(anchor="w", pady=(0, 2))
+            lbl_titulo = ttk.Label(info_sub, text=f"{i+1}. {item.get('title')}", font=("Segoe UI", 10, "bold"), background=CTX_SURFACE, foreground=CTX_TEXT)
+            lbl_titulo.pack(anchor="w", pady=(0, 2))
+            self.playlist_filas.append((item.get('id'), card, lbl_titulo, item.get('title')))
             ttk.Label(info_sub, text=f"Duración: {item.get('duration')} - Canal: {item.get('uploader')}", font=("Segoe UI", 8), background=CTX_SURFACE, foreground=CTX_TEXT_SEC).pack(anchor="w")
 
-        # Buttons for selection
-        btn_sel_frame = ttk.Frame(self.container)
-        btn_sel_frame.pack(fill=tk.X, pady=(0, 20))
-        ttk.Button(btn_sel_frame, text="Marcar Todas", width=15, command=self.sel_all).pack(side=tk.LEFT, padx=(0, 10))
-        ttk.Button(btn_sel_frame, text="Desmarcar Todas", width=15, command=self.sel_none).pack(side=tk.LEFT)
+        self._actualizar_contador()
+
+    def quitar_playlist_items(self, ids):
+        """Quita los items que ya no están en la playlist y renumera el resto."""
+        ids = set(ids)
+        filas, variables = [], []
+        for fila, var in zip(self.playlist_filas, self.playlist_vars):
+            if fila[0] in ids:
+                fila[1].destroy()
+            else:
+                filas.append(fila)
+                variables.append(var)
+        self.playlist_filas, self.playlist_vars = filas, variables
+        for i, (_, _, lbl_titulo, titulo) in enumerate(filas):
+            if lbl_titulo.winfo_exists(): lbl_titulo.config(text=f"{i+1}. {titulo}")
+        self._actualizar_contador()
+
+    def finalizar_carga(self):
+        self.cargando = False
+        self._actualizar_contador()
+
+    def _actualizar_contador(self):
+        if not self.lbl_count or not self.lbl_count.winfo_exists(): return
+        sufijo = " - cargando..." if self.cargando else ""
+        self.lbl_count.config(text=f"Selecciona las Canciones ({len(self.playlist_vars)}{sufijo}):")
 
     def _cargar_thumbnail_async(self, url, label_widget):
         try:
-            resp = requests.get(url, timeout=5)
-            if resp.status_code == 200:
-                data = BytesIO(resp.content)
+            if not label_widget.winfo_exists(): return
+            contenido = HttpClient.compartido().obtener_bytes(url)
+            if contenido:
+                data = BytesIO(contenido)
                 pil_img = Image.open(data)
                 pil_img.thumbnail((64, 36)) 
                 tk_img = ImageTk.PhotoImage(pil_img)
@@ -10,6 +10,7 @@ class DownloadOptionsPanel(ttk.Frame):
         
         self.audio_format_var = tk.StringVar(value="mp3")
         self.video_format_var = tk.StringVar(value="mp4")
+        self.sync_var = tk.IntVar(value=0)
         
         self._show_initial_state()
         
@@ -24,7 +25,12 @@ class DownloadOptionsPanel(ttk.Frame):
         
         ttk.Button(self, text="Limpiar Todo", command=self.on_clear_click).pack(pady=20)
         
-    def show_audio_config(self, on_start_download):
+    def _sync_checkbox(self, parent):
+        # Solo playlists: saltar lo que ya está en la biblioteca (descargado antes en el mismo formato)
+        ttk.Checkbutton(parent, text="Solo nuevas (sincronizar con lo ya descargado)", variable=self.sync_var,
+                        style="TCheckbutton").pack(anchor="w", pady=(10, 0))
+
+    def show_audio_config(self, on_start_download, is_playlist=False):
         for w in self.winfo_children(): w.destroy()
         
         header = ttk.Frame(self)
@@ -37,6 +43,7 @@ class DownloadOptionsPanel(ttk.Frame):
         
         ttk.Radiobutton(opts_frame, text="MP3 (Más compatible)", variable=self.audio_format_var, value="mp3", style="Surface.TRadiobutton").pack(anchor="w", pady=5)
         ttk.Radiobutton(opts_frame, text="Opus (Mejor calidad)", variable=self.audio_format_var, value="opus", style="Surface.TRadiobutton").pack(anchor="w", pady=5)
+        if is_playlist: self._sync_checkbox(opts_frame)
         
         ttk.Button(opts_frame, text="⬇ COMENZAR DESCARGA", command=on_start_download, style="Accent.TButton").pack(fill=tk.X, pady=(15, 0))
 
@@ -54,6 +61,7 @@ class DownloadOptionsPanel(ttk.Frame):
         
         ttk.Radiobutton(opts_frame, text="MP4 (Más compatible)", variable=self.video_format_var, value="mp4", style="Surface.TRadiobutton").pack(anchor="w", pady=5)
         ttk.Radiobutton(opts_frame, text="VP9/WebM (Mejor calidad)", variable=self.video_format_var, value="webm", style="Surface.TRadiobutton").pack(anchor="w", pady=5)
+        if is_playlist: self._sync_checkbox(opts_frame)
         
         btn_text = "⬇ COMENZAR DESCARGA" if is_playlist else "➜ CONTINUAR"
         ttk.Button(opts_frame, text=btn_text, command=on_start_download, style="Accent.TButton").pack(fill=tk.X, pady=(15, 0))
@@ -63,3 +71,6 @@ class DownloadOptionsPanel(ttk.Frame):
         
     def get_video_format(self):
         return self.video_format_var.get()
+
+    def get_sync_mode(self):
+        return self.sync_var.get() == 1
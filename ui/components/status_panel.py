@@ -11,7 +11,12 @@ class StatusPanel(ttk.Frame):
         
         self.status_var = tk.StringVar(value="Esperando enlace...")
         self.lbl_status = ttk.Label(self, textvariable=self.status_var, font=("Segoe UI", 9), foreground="#666")
-        self.lbl_status.pack(anchor="w", padx=20, pady=(0, 20))
+        self.lbl_status.pack(anchor="w", padx=20, pady=(0, 2))
+
+        # Resumen de lotes: hechos, fallidos, activos, velocidad y ETA
+        self.stats_var = tk.StringVar(value="")
+        self.lbl_stats = ttk.Label(self, textvariable=self.stats_var, font=("Segoe UI", 8), foreground="#888")
+        self.lbl_stats.pack(anchor="w", padx=20, pady=(0, 18))
         
     def set_status(self, msg):
         self.status_var.set(msg)
@@ -20,3 +25,7 @@ class StatusPanel(ttk.Frame):
     def set_progress(self, val):
         self.progress_var.set(val)
         self.update_idletasks()
+
+    def set_stats(self, msg):
+        self.stats_var.set(msg)
+        self.update_idletasks()
@@ -2,10 +2,10 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
 from io import BytesIO
-import requests
 from PIL import Image, ImageTk
 
 from utils.utils import Utils
+from services.http_client import HttpClient
 from controllers.app_controller import AppController
 
 # Components
@@ -37,9 +37,54 @@ class MainWindow(tk.Tk):
         self.video_data = None 
         self.last_img_data = None 
         self.image_references = [] 
+        self.content_preview = None
+        self._analisis_actual = 0
         
         self._init_ui()
+        self.after(500, self._ofrecer_reanudar)
         
+    def _ofrecer_reanudar(self):
+        # Lotes que quedaron a medias en una ejecución anterior
+        for lote in self.controller.get_pending_batches():
+            nombre = lote['parametros'].get('playlist_title') or lote['url']
+            total = len(lote['items'])
+            if messagebox.askyesno("Descarga sin terminar",
+                                   f"'{nombre}' quedó a medias ({lote['pendientes']} de {total} pendientes).\n¿Reanudar ahora?"):
+                self.input_panel.set_state("disabled")
+                self.status_panel.set_status("♻️ Reanudando descarga...")
+                self.controller.resume_batch(
+                    lote, progress_callback=self.status_panel.set_progress,
+                    status_callback=self.status_panel.set_status,
+                    finished_callback=self._on_reanudacion_terminada,
+                    stats_callback=self._mostrar_estadisticas_lote
+                )
+                return
+            # "No" es "ahora no": solo se descarta si se confirma (si no, se vuelve a ofrecer la próxima vez)
+            if messagebox.askyesno("Descarga sin terminar",
+                                   f"¿Descartar '{nombre}'?\nNo se podrá reanudar después.", default=messagebox.NO):
+                self.controller.discard_batch(lote['id'])
+
+    def _mostrar_estadisticas_lote(self, stats):
+        partes = [f"✓ {stats['completados']}/{stats['total']}"]
+        if stats['fallidos']: partes.append(f"✗ {stats['fallidos']}")
+        partes.append(f"⇣ {stats['activos']}/{stats['concurrencia']}")
+        if stats['bytes_por_segundo']: partes.append(f"{Utils.formatear_tamano(stats['bytes_por_segundo'])}/s")
+        if stats['eta'] is not None:
+            minutos, segundos = divmod(int(stats['eta']), 60)
+            partes.append(f"ETA {minutos}:{segundos:02d}")
+        self.status_panel.set_stats(" · ".join(partes))
+
+    def _on_reanudacion_terminada(self, success, msg):
+        self.status_panel.set_stats("")
+        if success:
+            self.status_panel.set_status("✓ ¡Listo! Guardado.")
+            self.status_panel.set_progress(100)
+            messagebox.showinfo("Completado", msg)
+        else:
+            self.status_panel.set_status("Error :(")
+            messagebox.showerror("Error", f"Falló:\n{msg}")
+        self.input_panel.set_state("normal")
+
     def _init_styles(self):
         style = ttk.Style()
         style.theme_use('clam') 
@@ -114,24 +159,62 @@ class MainWindow(tk.Tk):
 
         self.bind_all("<MouseWheel>", self._on_mousewheel)
         
-    def _on_analizar_click(self, url):
+    def _on_analizar_click(self, url, refrescar=False):
         self.input_panel.set_state("disabled")
         self.image_references = []
-        threading.Thread(target=self._proceso_analisis, args=(url,), daemon=True).start()
-        
-    def _proceso_analisis(self, url):
-        self.video_data, error = self.controller.analyze_url(url)
-        self.last_img_data = None
-        
-        if self.video_data and self.video_data.get('thumbnail'):
-            try:
-                resp = requests.get(self.video_data['thumbnail'], timeout=10)
-                if resp.status_code == 200:
-                    self.last_img_data = BytesIO(resp.content)
-            except Exception as e:
-                print(f"Error descargando thumbnail principal: {e}")
+        threading.Thread(target=self._proceso_analisis, args=(url, refrescar), daemon=True).start()
+
+    def _on_actualizar_playlist(self):
+        url = self.input_panel.get_url()
+        if url: self._on_analizar_click(url, refrescar=True)
         
-        self.after(0, self._post_analisis)
+    def _proceso_analisis(self, url, refrescar=False):
+        # Análisis incremental: la vista se arma con la cabecera y la lista se va completando por bloques
+        self._analisis_actual += 1
+        analisis = self._analisis_actual
+        vigente = lambda: analisis == self._analisis_actual
+
+        def on_inicio(data):
+            if not vigente(): return
+            self.video_data = data
+            self.last_img_data = None
+            # La miniatura principal solo se muestra para videos sueltos
+            if data.get('type') != 'playlist' and data.get('thumbnail'):
+                try:
+                    contenido = HttpClient.compartido().obtener_bytes(data['thumbnail'])
+                    if contenido:
+                        self.last_img_data = BytesIO(contenido)
+                except Exception as e:
+                    print(f"Error descargando thumbnail principal: {e}")
+            self.after(0, self._post_analisis)
+
+        def on_items(items, desde):
+            if vigente(): self.after(0, self._agregar_items_playlist, items, desde)
+
+        def on_quitados(ids):
+            if vigente(): self.after(0, self._quitar_items_playlist, ids)
+
+        data, error = self.controller.analyze_url_streaming(url, on_inicio=on_inicio, on_items=on_items,
+                                                            cancelado=lambda: not vigente(), refrescar=refrescar,
+                                                            on_quitados=on_quitados)
+        if not vigente(): return
+        if data is None:
+            self.video_data = None
+            self.after(0, self._post_analisis)
+        elif data.get('type') == 'playlist':
+            self.after(0, self._fin_carga_playlist)
+
+    def _agregar_items_playlist(self, items, desde):
+        if self.content_preview:
+            self.content_preview.append_playlist_items(items, desde)
+
+    def _quitar_items_playlist(self, ids):
+        if self.content_preview:
+            self.content_preview.quitar_playlist_items(ids)
+
+    def _fin_carga_playlist(self):
+        if self.content_preview:
+            self.content_preview.finalizar_carga()
 
     def _post_analisis(self):
         if not self.video_data:
@@ -158,7 +241,7 @@ class MainWindow(tk.Tk):
         if not self.video_data: return
 
         # Content Preview
-        self.content_preview = ContentPreviewPanel(self.dynamic_frame)
+        self.content_preview = ContentPreviewPanel(self.dynamic_frame, on_refresh=self._on_actualizar_playlist)
         self.content_preview.pack(fill=tk.X, pady=(0, 0))
         self.content_preview.update_content(self.video_data, self.last_img_data)
 
@@ -172,8 +255,10 @@ class MainWindow(tk.Tk):
         self.download_options.pack(fill=tk.X, pady=(20, 0))
 
     def _mostrar_opciones_audio(self):
+        is_playlist = (self.video_data['type'] == 'playlist')
         self.download_options.show_audio_config(
-            on_start_download=lambda: self.iniciar_descarga_final(es_video=False, is_playlist=(self.video_data['type'] == 'playlist'))
+            on_start_download=lambda: self.iniciar_descarga_final(es_video=False, is_playlist=is_playlist),
+            is_playlist=is_playlist
         )
 
     def _mostrar_opciones_video(self):
@@ -211,11 +296,12 @@ class MainWindow(tk.Tk):
 
         video_fmt = self.download_options.get_video_format() if self.download_options else "mp4"
         audio_fmt = self.download_options.get_audio_format() if self.download_options else "mp3"
+        sincronizar = is_playlist and self.download_options is not None and self.download_options.get_sync_mode()
 
         self.input_panel.set_state("disabled")
-        threading.Thread(target=self._proceso_descarga_ui_flow, args=(url, path, es_video, is_playlist, indices, video_fmt, audio_fmt), daemon=True).start()
+        threading.Thread(target=self._proceso_descarga_ui_flow, args=(url, path, es_video, is_playlist, indices, video_fmt, audio_fmt, sincronizar), daemon=True).start()
 
-    def _proceso_descarga_ui_flow(self, url, path, es_video, is_playlist, indices, video_fmt, audio_fmt):
+    def _proceso_descarga_ui_flow(self, url, path, es_video, is_playlist, indices, video_fmt, audio_fmt, sincronizar=False):
         formato_id = None
         
         if es_video and not is_playlist:
@@ -248,6 +334,7 @@ class MainWindow(tk.Tk):
              self.after(0, self._limpiar_frame_dinamico)
 
         def on_finish(success, msg):
+            self.status_panel.set_stats("")
             if success:
                 self.status_panel.set_status("✓ ¡Listo! Guardado.")
                 self.status_panel.set_progress(100)
@@ -267,7 +354,9 @@ class MainWindow(tk.Tk):
             playlist_indices=indices,
             progress_callback=self.status_panel.set_progress,
             status_callback=self.status_panel.set_status,
-            finished_callback=on_finish
+            finished_callback=on_finish,
+            sincronizar=sincronizar,
+            stats_callback=self._mostrar_estadisticas_lote
         )
 
 if __name__ == "__main__":
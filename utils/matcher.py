@@ -0,0 +1,80 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import FrozenSet, Optional
+
+_RE_PARENTESIS = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+_RE_FEAT = re.compile(r'\s(?:feat|ft|featuring)\b\.?.*$', re.IGNORECASE)
+_RE_NO_ALFANUM = re.compile(r'[^\w\s]')
+_RE_ESPACIOS = re.compile(r'\s+')
+_PALABRAS_RUIDO = frozenset({'official', 'video', 'audio', 'lyrics', 'lyric', 'hd', 'hq', 'remastered', 'topic', 'vevo'})
+
+
+class Matcher:
+    """Comparación rápida de títulos/artistas por tokens normalizados (reemplaza a difflib)."""
+
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def normalizar(texto: str) -> str:
+        """Minúsculas, sin acentos, sin paréntesis/corchetes, sin 'feat.' ni puntuación."""
+        if not texto: return ''
+        texto = unicodedata.normalize('NFKD', texto)
+        texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+        texto = _RE_PARENTESIS.sub(' ', texto)
+        texto = _RE_FEAT.sub('', texto)
+        texto = _RE_NO_ALFANUM.sub(' ', texto)
+        return _RE_ESPACIOS.sub(' ', texto).strip()
+
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def tokens(texto: str) -> FrozenSet[str]:
+        # Sin palabras de relleno de YouTube; si el título es solo eso (una canción llamada "Video"), se conservan
+        todos = frozenset(Matcher.normalizar(texto).split())
+        return (todos - _PALABRAS_RUIDO) or todos
+
+    @staticmethod
+    def similitud(a: str, b: str) -> float:
+        """
+        0..1. Igualdad = 1; si no, coeficiente de Dice de tokens (un título contenido en otro puntúa
+        según la proporción de largo: "Yesterday" vs "Yesterday Once More" = 0.5).
+        """
+        ta, tb = Matcher.tokens(a), Matcher.tokens(b)
+        if not ta or not tb: return 0.0
+        if ta == tb: return 1.0
+        comunes = len(ta & tb)
+        if not comunes and (len(ta) == 1 or len(tb) == 1):
+            # Títulos de una sola "palabra" (p. ej. japonés sin espacios): bigramas de caracteres
+            return max(2.0 * comunes / (len(ta) + len(tb)), Matcher._similitud_bigramas(a, b))
+        return 2.0 * comunes / (len(ta) + len(tb))
+
+    @staticmethod
+    def artista_compatible(conocido: str, candidato: str, umbral: float) -> bool:
+        """Similitud >= umbral, o el artista conocido aparece completo entre los créditos del candidato."""
+        if not candidato: return False
+        tc = Matcher.tokens(conocido)
+        return Matcher.similitud(conocido, candidato) >= umbral or bool(tc) and tc <= Matcher.tokens(candidato)
+
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def _bigramas(texto: str) -> FrozenSet[str]:
+        compacto = Matcher.normalizar(texto).replace(' ', '')
+        return frozenset(compacto[i:i + 2] for i in range(len(compacto) - 1))
+
+    @staticmethod
+    def _similitud_bigramas(a: str, b: str) -> float:
+        ba, bb = Matcher._bigramas(a), Matcher._bigramas(b)
+        if not ba or not bb: return 0.0
+        return 2.0 * len(ba & bb) / (len(ba) + len(bb))
+
+    @staticmethod
+    def puntuar(titulo_obj: str, titulo: str, artista_obj: Optional[str] = None, artista: Optional[str] = None,
+                duracion_obj: Optional[float] = None, duracion: Optional[float] = None) -> float:
+        """Puntuación ponderada de un candidato: título 0.6, artista 0.3, duración 0.1 (si se conocen)."""
+        partes = [(0.6, Matcher.similitud(titulo_obj, titulo))]
+        if artista_obj and artista:
+            partes.append((0.3, Matcher.similitud(artista_obj, artista)))
+        if duracion_obj and duracion:
+            diferencia = abs(duracion_obj - duracion)
+            partes.append((0.1, max(0.0, 1.0 - diferencia / 30.0)))
+        peso_total = sum(peso for peso, _ in partes)
+        return sum(peso * valor for peso, valor in partes) / peso_total
@@ -1,4 +1,7 @@
 import os
+import hashlib
+import subprocess
+from typing import Optional
 
 class Utils:
     """Funciones de utilidad estáticas."""
@@ -11,22 +14,86 @@ class Utils:
             bytes_val /= 1024.0
         return f"{bytes_val:.2f} TB"
 
+    @staticmethod
+    def _startupinfo():
+        # Evita que se abra una consola por cada llamada a ffmpeg en Windows
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        return startupinfo
+
     @staticmethod
     def verificar_ffmpeg() -> bool:
         try:
-            import subprocess
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
             resultado = subprocess.run(
                 ['ffmpeg', '-version'], 
                 capture_output=True, 
                 text=True,
-                startupinfo=startupinfo,
+                startupinfo=Utils._startupinfo(),
                 timeout=3
             )
             return resultado.returncode == 0
         except:
             return False
+
+    @staticmethod
+    def duracion_audio(ruta: str) -> Optional[float]:
+        """Duración en segundos leída de la cabecera (sin decodificar)."""
+        try:
+            import mutagen
+            archivo = mutagen.File(ruta)
+            return archivo.info.length if archivo and archivo.info else None
+        except Exception:
+            return None
+
+    @staticmethod
+    def decodificar_fragmento(ruta: str, inicio: float, duracion: float) -> Optional[bytes]:
+        """Decodifica SOLO [inicio, inicio + duracion] a WAV mono 16 kHz (lo que necesita Shazam)."""
+        try:
+            resultado = subprocess.run(
+                ['ffmpeg', '-v', 'error', '-ss', f"{inicio:.2f}", '-t', f"{duracion:.2f}", '-i', ruta,
+                 '-vn', '-ac', '1', '-ar', '16000', '-f', 'wav', '-'],
+                capture_output=True,
+                startupinfo=Utils._startupinfo(),
+                timeout=60
+            )
+            if resultado.returncode != 0 or not resultado.stdout:
+                return None
+            return resultado.stdout
+        except Exception:
+            return None
+
+    @staticmethod
+    def convertir_audio(ruta: str, destino: str, argumentos_codec: list) -> bool:
+        """Extrae la pista de audio de 'ruta' a 'destino' con los argumentos de códec dados (p.ej. ['-c:a', 'copy'])."""
+        try:
+            resultado = subprocess.run(
+                ['ffmpeg', '-y', '-v', 'error', '-i', ruta, '-vn', '-map', '0:a:0'] + argumentos_codec + [destino],
+                capture_output=True,
+                startupinfo=Utils._startupinfo(),
+                timeout=600
+            )
+            return resultado.returncode == 0 and os.path.exists(destino)
+        except Exception:
+            return False
+
+    @staticmethod
+    def huella_audio(ruta: str, duracion: int = 30) -> Optional[str]:
+        """
+        Hash (SHA-1) del audio DECODIFICADO de los primeros segundos del archivo.
+        No cambia al reescribir tags ni al renombrar. None si ffmpeg no está disponible o falla.
+        """
+        try:
+            resultado = subprocess.run(
+                ['ffmpeg', '-v', 'error', '-t', str(duracion), '-i', ruta,
+                 '-vn', '-ac', '1', '-ar', '11025', '-f', 's16le', '-'],
+                capture_output=True,
+                startupinfo=Utils._startupinfo(),
+                timeout=60
+            )
+            if resultado.returncode != 0 or not resultado.stdout:
+                return None
+            return hashlib.sha1(resultado.stdout).hexdigest()
+        except Exception:
+            return None